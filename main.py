@@ -22,6 +22,7 @@ print(f"Python 路径前3项: {sys.path[:3]}")
 # 现在可以安全地导入其他模块
 import logging
 import argparse
+import traceback
 
 # 自动加载.env文件（如果存在）
 def load_env_file():
@@ -75,7 +76,6 @@ def main():
 
     except Exception as e:
         logger.error(f"运行监控任务时出错: {e}")
-        import traceback
         logger.error(traceback.format_exc())
         return 1
 
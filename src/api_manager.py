@@ -20,6 +20,7 @@ import queue
 
 from src.config_manager import get_config, get_int_config, get_bool_config, get_list_config
 from src.error_handler import ErrorSeverity, get_error_manager, handle_errors, error_context
+from src.json_utils import json_loads
 from src.resource_manager import managed_session
 
 logger = logging.getLogger(__name__)
@@ -357,7 +358,8 @@ class SmartAPIManager:
                         response = session.post(api_url, json=payload, timeout=timeout)
                     
                     response.raise_for_status()
-                    return response.json()
+                    # orjson可用时比response.json()快得多
+                    return json_loads(response.content)
             
             except Exception as e:
                 last_error = e
@@ -123,6 +123,8 @@ class Config:
 
         # 网站监控配置 - 优化网站地图并发处理
         self.max_concurrent = int(os.environ.get('MAX_CONCURRENT', '10'))  # 从3提升到10，提高网站地图处理效率
+        self.max_collector_workers = int(os.environ.get('MAX_COLLECTOR_WORKERS', '32'))  # 网站收集共享线程池上限，I/O密集可远高于CPU核数
+        self.cpu_bound_collect = os.environ.get('CPU_BOUND_COLLECT', 'auto').lower()  # 进程池收集：auto按记录数自动选择，true强制启用，false禁用
 
         # 关键词批处理配置 - 根据seokey API限制调整为5
         raw_batch_size = int(os.environ.get('KEYWORDS_BATCH_SIZE', '5'))  # seokey API支持最多5个关键词/请求
@@ -137,6 +139,7 @@ class Config:
         except json.JSONDecodeError:
             logger.warning("KEYWORDS_API_URLS格式无效，使用空列表")
             self.keywords_api_urls = []
+        self.keywords_concurrency = int(os.environ.get('KEYWORDS_CONCURRENCY', '2'))  # 单个API客户端同时查询的批次数
 
         # API健康检查和容错配置 - 根据seokey API特性调整
         self.api_retry_max = int(os.environ.get('API_RETRY_MAX', '2'))  # 减少重试次数，避免长时间等待
@@ -149,6 +152,10 @@ class Config:
         self.site_request_timeout = int(os.environ.get('SITE_REQUEST_TIMEOUT', '20'))  # 网站请求超时20秒
         self.queue_timeout = int(os.environ.get('QUEUE_TIMEOUT', '300'))  # 队列处理超时300秒，考虑长响应时间
 
+        # 关键词查询结果缓存配置 - 相同关键词在有效期内不再重复请求API
+        self.keyword_cache_ttl = int(os.environ.get('KEYWORD_CACHE_TTL', '3600'))  # 缓存有效期（秒）
+        self.keyword_cache_max_size = int(os.environ.get('KEYWORD_CACHE_MAX_SIZE', '50000'))  # 最大缓存关键词数
+
         # 性能优化模式配置
         self.enable_performance_mode = os.environ.get('ENABLE_PERFORMANCE_MODE', 'true').lower() == 'true'
 
@@ -157,6 +164,8 @@ class Config:
 
         # 关键词指标API批量提交配置
         self.metrics_api_max_batch_size = int(os.environ.get('METRICS_API_MAX_BATCH_SIZE', '200'))  # 批量提交最大条数
+        self.metrics_api_max_concurrent = int(os.environ.get('METRICS_API_MAX_CONCURRENT', '4'))  # 批量提交最大并发批次数
+        self.metrics_api_qps = float(os.environ.get('METRICS_API_QPS', '2.0'))  # 批量提交速率上限（请求/秒），0表示不限流
 
         # API密钥配置 - 继续使用SITEMAP_API_KEY作为通用API密钥
         self.sitemap_api_key = os.environ.get('SITEMAP_API_KEY', '')
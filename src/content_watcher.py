@@ -5,17 +5,43 @@
 遵循SOLID原则，复用现有组件，零技术债务
 """
 
+import functools
 import logging
+import multiprocessing
+import os
 import time
-from typing import Dict, Set, List, Any
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Set, List, Any, Optional, Tuple
 from urllib.parse import urlparse
 
+import requests
+
+from src import site_data_collector
 from src.site_data_collector import SiteDataCollector
 from src.site_update_processor import SiteUpdateProcessor
 from src.config import config
+from src.data_manager import data_manager
 
 logger = logging.getLogger(__name__)
 
+# 进程池启用阈值：站点数超过该值且站点平均历史记录数（约25µs/条）估算的处理耗时超过50ms
+PROCESS_POOL_MIN_SITES = 4
+PROCESS_POOL_MIN_RECORDS = 2000
+
+# 单个站点处理失败时预期出现的异常：网络错误、文件/连接错误以及数据格式问题，
+# 其他异常属于程序错误，不再逐站点吞掉
+SITE_ERRORS = (requests.RequestException, OSError, KeyError, ValueError, TypeError)
+
+
+@functools.lru_cache(maxsize=None)
+def _api_client_closers() -> Tuple[Callable[[], None], ...]:
+    """各API客户端的close方法，首次调用时导入（保持延迟加载）并缓存"""
+    from src.keyword_metrics_api import metrics_api
+    from src.sitemap_parser import sitemap_parser
+    from src.keyword_api_multi import multi_api_manager
+
+    return sitemap_parser.close, multi_api_manager.close, metrics_api.close
+
 
 class ContentWatcher:
     """内容监控器 - 适配器模式实现
@@ -43,6 +69,9 @@ class ContentWatcher:
         self._site_collector = SiteDataCollector()
         self._update_processor = SiteUpdateProcessor()
         
+        # 各阶段共享的线程池，避免每个阶段重复创建/销毁线程
+        self._executor: Optional[ThreadPoolExecutor] = self._create_executor()
+        
         logger.info(f"ContentWatcher初始化完成 - 测试模式: {test_mode}")
     
     def run(self) -> None:
@@ -55,31 +84,43 @@ class ContentWatcher:
         4. 显示统计信息
         """
         try:
-            start_time = time.time()
-            logger.info("开始执行内容监控")
-            
-            # 第一阶段：收集网站数据
-            all_site_data = self._collect_all_sites_data()
-            
-            if not all_site_data:
-                logger.info("没有发现任何网站更新")
-                return
-            
-            # 第二阶段：查询关键词数据
-            global_keyword_data = self._query_keywords_data(all_site_data)
-            
-            # 第三阶段：处理更新
-            self._process_all_updates(all_site_data, global_keyword_data)
-            
-            # 第四阶段：显示统计
-            self._display_statistics(all_site_data)
-            
-            elapsed_time = time.time() - start_time
-            logger.info(f"内容监控完成，耗时: {elapsed_time:.2f}秒")
-            
+            self._run_stages()
         except Exception as e:
             logger.error(f"内容监控执行失败: {e}")
             raise
+        finally:
+            # 第三阶段各站点只暂存更新，这里统一写入一次数据文件
+            saved = data_manager.flush()
+            self._close_api_clients()
+
+        # 只在流程本身成功时检查保存结果，避免覆盖正在传播的异常
+        if not saved:
+            raise Exception("无法保存暂存的站点数据")
+
+    def _run_stages(self) -> None:
+        """依次执行监控流程的各个阶段"""
+        start_time = time.time()
+        logger.info("开始执行内容监控")
+
+        # 第一阶段：收集网站数据
+        all_site_data = self._collect_all_sites_data()
+
+        if not all_site_data:
+            logger.info("没有发现任何网站更新")
+            return
+
+        # 第二阶段：查询关键词数据（关键词集合只构建一次，统计阶段复用）
+        all_keywords = self._gather_keywords(all_site_data)
+        global_keyword_data = self._query_keywords_data(all_keywords)
+
+        # 第三阶段：处理更新
+        self._process_all_updates(all_site_data, global_keyword_data)
+
+        # 第四阶段：显示统计
+        self._display_statistics(all_site_data, len(all_keywords))
+
+        elapsed_time = time.time() - start_time
+        logger.info(f"内容监控完成，耗时: {elapsed_time:.2f}秒")
     
     def _collect_all_sites_data(self) -> Dict[str, Dict[str, Any]]:
         """收集所有网站数据
@@ -88,42 +129,115 @@ class ContentWatcher:
             Dict[site_id, site_data]: 网站数据字典
         """
         all_site_data = {}
+        website_urls = config.website_urls
         
-        logger.info(f"开始收集 {len(config.website_urls)} 个网站的数据")
+        logger.info(f"开始收集 {len(website_urls)} 个网站的数据")
         
-        for index, url in enumerate(config.website_urls):
-            try:
-                logger.info(f"处理网站 {index + 1}/{len(config.website_urls)}: {self._mask_url(url)}")
-                
-                site_id, site_data = self._site_collector.collect_site_data(url, index)
+        if not website_urls:
+            return all_site_data
+        
+        # 网站之间相互独立，并发收集，总耗时取决于最慢的站点而非所有站点之和
+        executor, collect_func = self._create_collect_executor(website_urls)
+        try:
+            futures = []
+            for index, url in enumerate(website_urls):
+                logger.info(f"处理网站 {index + 1}/{len(website_urls)}: {self._mask_url(url)}")
+                futures.append(executor.submit(collect_func, url, index))
+            
+            # 按配置顺序汇总结果，保证后续处理顺序稳定
+            for url, future in zip(website_urls, futures):
+                try:
+                    site_id, site_data = future.result()
+                except (*SITE_ERRORS, BrokenExecutor) as e:
+                    logger.error(f"收集网站数据失败: {self._mask_url(url)}, 错误: {e}")
+                    logger.debug("收集网站数据失败详情", exc_info=True)
+                    continue
                 
                 if site_data.get('updated_urls'):
                     all_site_data[site_id] = site_data
                     logger.info(f"网站 {site_id} 发现 {len(site_data['updated_urls'])} 个更新")
                 else:
                     logger.info(f"网站 {site_id} 没有发现更新")
-                    
-            except Exception as e:
-                logger.error(f"收集网站数据失败: {self._mask_url(url)}, 错误: {e}")
-                continue
+        finally:
+            # 共享线程池由_close_api_clients统一关闭，仅关闭本阶段单独创建的进程池
+            if executor is not self._executor:
+                executor.shutdown()
         
         logger.info(f"数据收集完成，{len(all_site_data)} 个网站有更新")
         return all_site_data
     
-    def _query_keywords_data(self, all_site_data: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
-        """查询关键词数据
+    def _create_collect_executor(self, website_urls: List[str]) -> Tuple[Executor, Callable]:
+        """选择数据收集阶段的执行器
+        
+        站点较多且每个站点需要解密/加密的历史记录较多时，AES和JSON处理是CPU密集型的，
+        线程受GIL限制无法并行，改用进程池；否则使用线程池即可覆盖网络等待。
+        
+        Args:
+            website_urls: 网站URL列表
+            
+        Returns:
+            Tuple[执行器, 收集函数]
+        """
+        if self._use_process_pool(website_urls):
+            max_workers = max(1, min(len(website_urls), os.cpu_count() or 1))
+            logger.info(f"站点平均记录数 {data_manager.average_record_count():.0f}，使用 {max_workers} 个进程并行收集")
+            executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+            return executor, site_data_collector.collect_site_data
+        
+        return self._get_executor(), self._site_collector.collect_site_data
+    
+    @staticmethod
+    def _use_process_pool(website_urls: List[str]) -> bool:
+        """根据CPU_BOUND_COLLECT配置判断收集阶段是否使用进程池
+
+        Args:
+            website_urls: 网站URL列表
+
+        Returns:
+            bool: true时强制使用，false时禁用，auto时按站点数和平均记录数自动判断
+        """
+        if config.cpu_bound_collect == 'true':
+            return len(website_urls) > 1
+        if config.cpu_bound_collect == 'false':
+            return False
+        return (len(website_urls) > PROCESS_POOL_MIN_SITES
+                and data_manager.average_record_count() >= PROCESS_POOL_MIN_RECORDS)
+    
+    @staticmethod
+    def _create_executor() -> ThreadPoolExecutor:
+        """创建各阶段共享的线程池，线程数取网站数量与MAX_COLLECTOR_WORKERS中的较小值"""
+        max_workers = max(1, min(len(config.website_urls), config.max_collector_workers))
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='content-watcher')
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """获取共享线程池，上一次run()结束时已关闭则重新创建"""
+        if self._executor is None:
+            self._executor = self._create_executor()
+        return self._executor
+    
+    def _gather_keywords(self, all_site_data: Dict[str, Dict[str, Any]]) -> Set[str]:
+        """汇总所有网站的关键词（已去除空值）
         
         Args:
             all_site_data: 所有网站数据
             
         Returns:
-            Dict[keyword, data]: 关键词数据字典
+            Set[str]: 去重后的关键词集合
         """
-        # 收集所有关键词
-        all_keywords = set()
-        for site_data in all_site_data.values():
-            all_keywords.update(site_data.get('keywords', []))
+        # 一次set.union调用在C层合并所有站点的关键词集合
+        all_keywords = set().union(*(site_data.get('keywords', ()) for site_data in all_site_data.values()))
+        all_keywords.discard('')
+        return all_keywords
+    
+    def _query_keywords_data(self, all_keywords: Set[str]) -> Dict[str, Any]:
+        """查询关键词数据
         
+        Args:
+            all_keywords: 去重后的关键词集合
+            
+        Returns:
+            Dict[keyword, data]: 关键词数据字典
+        """
         if not all_keywords:
             logger.info("没有需要查询的关键词")
             return {}
@@ -131,6 +245,7 @@ class ContentWatcher:
         logger.info(f"开始查询 {len(all_keywords)} 个关键词的数据")
         
         try:
+            # 结果缓存由KeywordAPI统一维护，命中缓存的关键词不会再次请求API
             from src.keyword_api_multi import multi_api_manager
             global_keyword_data = multi_api_manager.batch_query_keywords_parallel(list(all_keywords))
             
@@ -155,28 +270,36 @@ class ContentWatcher:
         
         total_processed = 0
         
-        for site_id, site_data in all_site_data.items():
+        # 关键词数据已在第二阶段全部取回，各站点处理相互独立，主要耗时为指标API提交的网络I/O
+        executor = self._get_executor()
+        future_to_site = {
+            executor.submit(
+                self._update_processor.process_site_updates,
+                site_id, site_data, site_data.get('url_keywords_map', {}), global_keyword_data
+            ): site_id
+            for site_id, site_data in all_site_data.items()
+        }
+        
+        for future in as_completed(future_to_site):
+            site_id = future_to_site[future]
             try:
-                url_keywords_map = site_data.get('url_keywords_map', {})
-                
-                processed_urls = self._update_processor.process_site_updates(
-                    site_id, site_data, url_keywords_map, global_keyword_data
-                )
-                
-                total_processed += len(processed_urls)
-                logger.info(f"网站 {site_id} 处理了 {len(processed_urls)} 个URL")
-                
-            except Exception as e:
+                processed_urls = future.result()
+            except SITE_ERRORS as e:
                 logger.error(f"处理网站 {site_id} 更新失败: {e}")
+                logger.debug(f"处理网站 {site_id} 更新失败详情", exc_info=True)
                 continue
+            
+            total_processed += len(processed_urls)
+            logger.info(f"网站 {site_id} 处理了 {len(processed_urls)} 个URL")
         
         logger.info(f"更新处理完成，总计处理 {total_processed} 个URL")
     
-    def _display_statistics(self, all_site_data: Dict[str, Dict[str, Any]]) -> None:
+    def _display_statistics(self, all_site_data: Dict[str, Dict[str, Any]], total_keywords: int) -> None:
         """显示统计信息
         
         Args:
             all_site_data: 所有网站数据
+            total_keywords: 去重后的关键词总数
         """
         logger.info("=" * 50)
         logger.info("监控统计信息")
@@ -185,7 +308,6 @@ class ContentWatcher:
         total_sites = len(config.website_urls)
         updated_sites = len(all_site_data)
         total_urls = sum(len(site_data.get('updated_urls', [])) for site_data in all_site_data.values())
-        total_keywords = len(set().union(*(site_data.get('keywords', []) for site_data in all_site_data.values())))
         
         logger.info(f"总网站数: {total_sites}")
         logger.info(f"有更新的网站数: {updated_sites}")
@@ -195,6 +317,18 @@ class ContentWatcher:
         if self.test_mode:
             logger.info("测试模式运行完成")
     
+    def _close_api_clients(self) -> None:
+        """关闭共享线程池以及各API客户端持有的持久连接池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        
+        for close in _api_client_closers():
+            try:
+                close()
+            except (OSError, RuntimeError) as e:
+                logger.warning(f"关闭API客户端时出错: {e}")
+    
     def _mask_url(self, url: str) -> str:
         """遮蔽URL敏感信息
         
@@ -7,8 +7,8 @@
 
 import os
 import json
-import base64
 import logging
+import functools
 import hashlib
 import time
 import threading
@@ -18,6 +18,7 @@ from urllib.parse import urlparse
 from contextlib import contextmanager
 
 from src.encryption import encryptor
+from src.json_utils import json_dumps, json_loads
 
 # 配置日志
 logger = logging.getLogger('content_watcher.data_manager')
@@ -25,6 +26,22 @@ logger = logging.getLogger('content_watcher.data_manager')
 # 文件路径
 DATA_FILE = 'previous_data.json'
 
+# 数据文件路径 -> ((修改时间, 文件大小), 解析后的站点数据)；站点数据只会被整体替换而不会原地修改，
+# 同一进程内多次创建DataManager或重新加载时可安全共享
+_LOAD_CACHE: Dict[str, tuple] = {}
+
+
+@functools.lru_cache(maxsize=1024)
+def _site_identifier(url: str) -> str:
+    """计算网站标识符，网站URL数量少且固定，结果缓存后各阶段重复查询无需再次哈希"""
+    try:
+        parsed = urlparse(url)
+        # 使用主机名MD5的前8个字符作为站点ID（仅用于标识，非安全用途）
+        return hashlib.md5(parsed.netloc.encode(), usedforsecurity=False).hexdigest()[:8]
+    except Exception:
+        # 如果解析失败，使用MD5哈希值的前8个字符
+        return hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()[:8]
+
 
 class IDataWriter(Protocol):
     """数据写入器接口 - 依赖倒置原则"""
@@ -132,7 +149,7 @@ class StreamingDataWriter:
             str: 序列化的JSON字符串片段
         """
         # 使用紧凑格式，减少内存占用
-        return f'"{site_id}":{json.dumps(data, separators=(",", ":"), ensure_ascii=False)}'
+        return f'"{site_id}":{json_dumps(data).decode("utf-8")}'
 
 class DataManager:
     """处理数据的存储和加载"""
@@ -140,20 +157,39 @@ class DataManager:
     def __init__(self):
         """初始化数据管理器"""
         self.previous_data = self._load_previous_data()
+        # 多个站点并发更新时串行化“读取-修改-保存”，避免后写入的站点覆盖先写入的站点
+        self._update_lock = threading.RLock()
+        # 站点ID -> (解密时对应的记录列表, 解密结果)；记录列表只会被整体替换，
+        # 通过对象身份判断缓存是否仍然有效，同一站点重复读取时无需再次解密
+        self._decrypt_cache: Dict[str, tuple] = {}
+        # 是否有通过mark_dirty暂存、尚未写入文件的站点更新
+        self._dirty = False
 
     def reload_data(self):
         """重新加载数据文件 - 用于测试和数据重置场景"""
         self.previous_data = self._load_previous_data()
+        self._decrypt_cache.clear()
         logger.debug("数据已重新加载")
 
     def _load_previous_data(self) -> Dict[str, List[Dict[str, str]]]:
         """加载先前保存的数据"""
         try:
             if os.path.exists(DATA_FILE):
-                # 使用缓冲读取来提高性能
-                with open(DATA_FILE, 'r', encoding='utf-8', buffering=65536) as f:
-                    data = json.load(f)
-                return data.get('sites', {})
+                # 文件未变化（修改时间和大小相同）时复用上次解析的结果，避免重复解析整个文件
+                stat = os.stat(DATA_FILE)
+                file_signature = (stat.st_mtime_ns, stat.st_size)
+                cached = _LOAD_CACHE.get(DATA_FILE)
+                if cached is not None and cached[0] == file_signature:
+                    logger.debug("数据文件未变化，复用已加载的数据")
+                    return cached[1]
+
+                # 一次读入全部字节后解析，orjson可用时直接解析UTF-8字节
+                with open(DATA_FILE, 'rb') as f:
+                    raw = f.read()
+                data = json_loads(raw)
+                sites = data.get('sites', {})
+                _LOAD_CACHE[DATA_FILE] = (file_signature, sites)
+                return sites
             else:
                 logger.info("先前的数据文件不存在，将创建新文件")
                 return {}
@@ -177,7 +213,11 @@ class DataManager:
             return {}
 
     def save_data(self, data: Dict[str, List[Dict[str, Any]]]) -> None:
-        """保存数据到文件 - 使用流式写入优化内存"""
+        """保存数据到文件 - 使用流式写入优化内存，失败时降级到备用保存方法
+
+        Raises:
+            Exception: 流式写入和备用写入都失败
+        """
         try:
             # 创建流式写入器
             file_writer = FileDataWriter(DATA_FILE)
@@ -210,7 +250,11 @@ class DataManager:
             yield site_id, site_data
     
     def _fallback_save_data(self, data: Dict[str, List[Dict[str, Any]]]) -> None:
-        """备用保存方法 - 传统原子写入"""
+        """备用保存方法 - 传统原子写入
+
+        Raises:
+            Exception: 备用写入也失败时重新抛出，由_save_data_safely重试并向上报告失败
+        """
         try:
             import tempfile
             logger.warning("使用备用保存方法")
@@ -237,16 +281,11 @@ class DataManager:
                 raise e
         except Exception as e:
             logger.error(f"备用保存也失败: {e}")
+            raise
 
     def get_site_identifier(self, url: str) -> str:
         """获取网站标识符"""
-        try:
-            parsed = urlparse(url)
-            # 使用主机名前8个字符作为站点ID
-            return hashlib.md5(parsed.netloc.encode()).hexdigest()[:8]
-        except Exception:
-            # 如果解析失败，使用MD5哈希值的前8个字符
-            return hashlib.md5(url.encode()).hexdigest()[:8]
+        return _site_identifier(url)
 
     def format_site_name(self, site_id: str, index: int) -> str:
         """格式化网站名称用于通知"""
@@ -261,62 +300,131 @@ class DataManager:
         Returns:
             tuple: (URL到lastmod的映射字典, URL到关键词数据的映射字典)
         """
+        previous_urls, previous_keywords_data, _ = self.get_previous_records(site_id)
+        return previous_urls, previous_keywords_data
+
+    def get_previous_records(self, site_id: str) -> tuple[Dict[str, str], Dict[str, Any], Dict[str, Dict[str, Any]]]:
+        """获取指定站点的先前记录，额外返回每个URL已存储的原始记录
+
+        Args:
+            site_id: 站点标识符
+
+        Returns:
+            tuple: (URL到lastmod的映射, URL到关键词数据的映射, URL到已存储记录的映射)，
+            结果会被缓存复用，调用方不应修改返回的字典
+        """
+        site_items = self.previous_data.get(site_id)
+        cached = self._decrypt_cache.get(site_id)
+        if cached is not None and cached[0] is site_items:
+            return cached[1]
+
         previous_urls = {}
         previous_keywords_data = {}  # 存储上一次的关键词数据
+        stored_items = {}  # 已存储的原始记录，未变化的URL可直接复用其中的密文而无需重新加密
 
-        if site_id in self.previous_data:
-            for item in self.previous_data[site_id]:
-                if 'encrypted_url' in item:
+        if site_items is not None:
+            items = [item for item in site_items if 'encrypted_url' in item]
+            # 同一站点的所有记录复用一个加密会话，先批量解密全部URL，再批量解密关键词数据
+            with encryptor.session() as cipher:
+                decrypted_urls = cipher.decrypt_many([item['encrypted_url'] for item in items])
+
+                keyword_entries = []  # [(解密后的URL, 加密的关键词数据)]
+                for item, url_bytes in zip(items, decrypted_urls):
                     try:
-                        decrypted_url = encryptor.decrypt_url(item['encrypted_url'])
-                        if decrypted_url:
-                            previous_urls[decrypted_url] = item.get('lastmod')
-                            # 如果存在关键词数据，也进行解密和存储
-                            if 'keywords_data' in item:
-                                try:
-                                    encrypted_keywords_data = item['keywords_data']
-                                    decoded_data = base64.b64decode(encrypted_keywords_data)
-                                    decrypted_data = encryptor.decrypt_data(decoded_data)
-                                    keywords_data = json.loads(decrypted_data)
-                                    previous_keywords_data[decrypted_url] = keywords_data
-                                except Exception as e:
-                                    logger.error(f"解密关键词数据时出错: {e}")
-                                    # 不输出完整URL，避免敏感信息泄露
-                                    domain_part = urlparse(decrypted_url).netloc if decrypted_url else '***'
-                                    logger.error(f"出错的域名: {domain_part}")
+                        decrypted_url = url_bytes.decode('utf-8') if url_bytes is not None else ''
+                    except UnicodeDecodeError:
+                        decrypted_url = ''
+                    if not decrypted_url:
+                        if url_bytes is None:
+                            # 不输出加密数据，避免敏感信息泄露
+                            logger.error("解密URL时出错，跳过此加密URL项目")
                         else:
                             logger.warning("URL解密结果为空，跳过此项目")
-                    except Exception as e:
-                        logger.error(f"解密URL时出错: {e}")
-                        # 不输出加密数据，避免敏感信息泄露
-                        logger.error("跳过此加密URL项目")
+                        continue
 
+                    previous_urls[decrypted_url] = item.get('lastmod')
+                    stored_items[decrypted_url] = item
+                    if 'keywords_data' in item:
+                        keyword_entries.append((decrypted_url, item['keywords_data']))
 
-        return previous_urls, previous_keywords_data
+                # 如果存在关键词数据，也进行解密和存储
+                decrypted_keywords = cipher.decrypt_many([value for _, value in keyword_entries])
+                for (decrypted_url, _), keywords_bytes in zip(keyword_entries, decrypted_keywords):
+                    try:
+                        if keywords_bytes is None:
+                            raise ValueError("关键词数据格式或填充无效")
+                        previous_keywords_data[decrypted_url] = json_loads(keywords_bytes)
+                    except ValueError as e:
+                        logger.error(f"解密关键词数据时出错: {e}")
+                        # 不输出完整URL，避免敏感信息泄露
+                        domain_part = urlparse(decrypted_url).netloc if decrypted_url else '***'
+                        logger.error(f"出错的域名: {domain_part}")
+
+        result = (previous_urls, previous_keywords_data, stored_items)
+        self._decrypt_cache[site_id] = (site_items, result)
+        return result
 
     def update_site_data(self, site_id: str, url_data_list: List[Dict[str, Any]]) -> None:
         """更新站点数据 - 优化并发安全性
 
+        各站点的记录列表视为只读，更新时整体替换而不是原地修改，因此只需浅拷贝
+        外层字典并重新绑定当前站点，其他站点的列表直接共享。
+
         Args:
             site_id: 站点标识符
             url_data_list: URL数据列表
         """
-        # 使用深拷贝避免并发修改问题
-        import copy
-        
-        # 创建数据副本进行更新
-        updated_data = copy.deepcopy(self.previous_data)
-        updated_data[site_id] = url_data_list
-        
-        # 保存更新后的数据
-        if self._save_data_safely(updated_data):
-            # 只有保存成功才更新内存中的数据
-            self.previous_data = updated_data
-            logger.debug(f"站点 {site_id} 数据更新成功")
-        else:
-            logger.error(f"站点 {site_id} 数据保存失败")
-            raise Exception(f"无法保存站点 {site_id} 的数据")
+        with self._update_lock:
+            # 浅拷贝后替换当前站点，保存失败时内存中的数据保持不变
+            updated_data = dict(self.previous_data)
+            updated_data[site_id] = url_data_list
+            
+            # 保存更新后的数据
+            if self._save_data_safely(updated_data):
+                # 只有保存成功才更新内存中的数据
+                self.previous_data = updated_data
+                self._decrypt_cache.pop(site_id, None)
+                logger.debug(f"站点 {site_id} 数据更新成功")
+            else:
+                logger.error(f"站点 {site_id} 数据保存失败")
+                raise Exception(f"无法保存站点 {site_id} 的数据")
     
+    def mark_dirty(self, site_id: str, url_data_list: List[Dict[str, Any]]) -> None:
+        """暂存站点数据更新，只修改内存数据，由flush统一写入文件
+
+        一次运行中每个站点都会更新一次，逐站点保存会反复重写整个数据文件，
+        暂存后在运行结束时只写一次。
+
+        Args:
+            site_id: 站点标识符
+            url_data_list: URL数据列表
+        """
+        with self._update_lock:
+            updated_data = dict(self.previous_data)
+            updated_data[site_id] = url_data_list
+            self.previous_data = updated_data
+            self._decrypt_cache.pop(site_id, None)
+            self._dirty = True
+            logger.debug(f"站点 {site_id} 数据已暂存，等待统一保存")
+
+    def flush(self) -> bool:
+        """将mark_dirty暂存的更新写入文件，没有暂存更新时不写文件
+
+        Returns:
+            bool: 保存是否成功（没有需要保存的数据时返回True）
+        """
+        with self._update_lock:
+            if not self._dirty:
+                return True
+
+            if self._save_data_safely(self.previous_data):
+                self._dirty = False
+                logger.info("暂存的站点数据已统一保存")
+                return True
+
+            logger.error("暂存的站点数据保存失败")
+            return False
+
     def _save_data_safely(self, data: Dict[str, List[Dict[str, Any]]]) -> bool:
         """安全保存数据 - 带重试机制
         
@@ -347,6 +455,12 @@ class DataManager:
         """检查是否是首次运行"""
         return not bool(self.previous_data)
 
+    def average_record_count(self) -> float:
+        """获取每个站点平均保存的URL记录数，用于估算解密/加密工作量"""
+        if not self.previous_data:
+            return 0.0
+        return sum(len(items) for items in self.previous_data.values()) / len(self.previous_data)
+
 
 
 # 创建全局数据管理器实例
@@ -8,17 +8,129 @@
 import base64
 import binascii
 import logging
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional
 
 from Crypto.Cipher import AES
 from Crypto.Random import get_random_bytes
 from Crypto.Util.Padding import pad, unpad
 
 from src.config import config
+from src.json_utils import json_dumps, json_loads
 
 # 配置日志
 logger = logging.getLogger('content_watcher.encryption')
 
-class Encryptor:
+
+def _b64encode(data: bytes) -> str:
+    """Base64编码为字符串，直接调用binascii，省去base64模块的参数转换开销"""
+    return binascii.b2a_base64(data, newline=False).decode('ascii')
+
+
+def _b64decode(value: str) -> bytes:
+    """Base64解码，行为与base64.b64decode(value)一致（非严格模式）"""
+    return binascii.a2b_base64(value)
+
+
+class _CipherCodec(ABC):
+    """URL/数据/JSON的编解码逻辑，具体的字节加解密由子类实现"""
+
+    @abstractmethod
+    def _encrypt_bytes(self, data: bytes) -> bytes:
+        """加密二进制数据，返回IV+密文"""
+        pass
+
+    @abstractmethod
+    def _decrypt_bytes(self, encrypted_data: bytes) -> bytes:
+        """解密IV+密文格式的二进制数据"""
+        pass
+
+    def encrypt_url(self, url: str) -> str:
+        """加密URL，返回加密后的URL（包含IV）
+
+        Args:
+            url: 要加密的URL字符串
+
+        Returns:
+            Base64编码的加密URL
+        """
+        encrypted_bytes = self._encrypt_bytes(url.encode('utf-8'))
+        # 转为Base64编码便于存储
+        return _b64encode(encrypted_bytes)
+
+    def decrypt_url(self, encrypted_data: str) -> str:
+        """解密URL
+
+        Args:
+            encrypted_data: Base64编码的加密URL
+
+        Returns:
+            解密后的URL字符串，失败时返回空字符串
+        """
+        try:
+            # 解码Base64数据
+            binary_data = _b64decode(encrypted_data)
+            decrypted_bytes = self._decrypt_bytes(binary_data)
+            return decrypted_bytes.decode('utf-8')
+        except (binascii.Error, ValueError, TypeError, IndexError, UnicodeDecodeError) as e:
+            logger.error(f"解密URL时出错: {e}")
+            return ""
+
+    def encrypt_data(self, data: bytes) -> bytes:
+        """加密任意二进制数据
+
+        Args:
+            data: 要加密的二进制数据
+
+        Returns:
+            加密后的数据（包含IV）
+        """
+        return self._encrypt_bytes(data)
+
+    def decrypt_data(self, encrypted_data: bytes) -> str:
+        """解密二进制数据
+
+        Args:
+            encrypted_data: 加密后的二进制数据（包含IV）
+
+        Returns:
+            解密后的文本，失败时返回空字符串
+        """
+        try:
+            decrypted_bytes = self._decrypt_bytes(encrypted_data)
+            return decrypted_bytes.decode('utf-8')
+        except (ValueError, IndexError, UnicodeDecodeError) as e:
+            logger.error(f"解密数据时出错: {e}")
+            return ""
+
+    def encrypt_json(self, obj: Any) -> str:
+        """将对象序列化为JSON后加密
+
+        Args:
+            obj: 可JSON序列化的对象
+
+        Returns:
+            Base64编码的加密数据（包含IV）
+        """
+        return _b64encode(self._encrypt_bytes(json_dumps(obj)))
+
+    def decrypt_json(self, encrypted_data: str) -> Any:
+        """解密Base64编码的数据并反序列化JSON
+
+        Args:
+            encrypted_data: encrypt_json生成的Base64字符串
+
+        Returns:
+            反序列化后的对象
+
+        Raises:
+            ValueError: Base64、解密或JSON格式无效时抛出
+        """
+        return json_loads(self._decrypt_bytes(_b64decode(encrypted_data)))
+
+
+class Encryptor(_CipherCodec):
     """处理数据加密和解密的类"""
 
     def __init__(self):
@@ -94,63 +206,123 @@ class Encryptor:
         decrypted_padded = cipher.decrypt(encrypted)
         return unpad(decrypted_padded, AES.block_size)
 
-    def encrypt_url(self, url: str) -> str:
-        """加密URL，返回加密后的URL（包含IV）
+    @contextmanager
+    def session(self) -> Iterator['EncryptionSession']:
+        """创建加密会话，批量处理同一站点的多条记录时复用密码对象
 
-        Args:
-            url: 要加密的URL字符串
+        会话对象不是线程安全的，每个线程/每批处理应各自创建会话。
 
-        Returns:
-            Base64编码的加密URL
+        Yields:
+            EncryptionSession: 与本加密器使用相同密钥、输出格式兼容的会话
         """
-        encrypted_bytes = self._encrypt_bytes(url.encode('utf-8'))
-        # 转为Base64编码便于存储
-        return base64.b64encode(encrypted_bytes).decode('utf-8')
+        yield EncryptionSession(self.encryption_key)
 
-    def decrypt_url(self, encrypted_data: str) -> str:
-        """解密URL
+
+class EncryptionSession(_CipherCodec):
+    """加密会话 - 复用同一组CBC密码对象处理多条记录，避免每条记录重新创建密码对象
+
+    加密时在每条明文前添加一个随机块并沿用上一条的CBC链：该随机块加密后的密文
+    （E(R ⊕ 前一密文块)）不可预测，可直接作为本条记录的IV，输出格式仍为IV+密文，
+    与Encryptor逐条加密的结果可互相解密。解密时同理，丢弃首块即可得到明文。
+    """
+
+    def __init__(self, encryption_key: bytes):
+        self._encrypt_cipher = AES.new(encryption_key, AES.MODE_CBC, get_random_bytes(AES.block_size))
+        self._decrypt_cipher = AES.new(encryption_key, AES.MODE_CBC, bytes(AES.block_size))
+
+    def _encrypt_bytes(self, data: bytes) -> bytes:
+        """加密二进制数据，返回IV+密文"""
+        return self._encrypt_cipher.encrypt(get_random_bytes(AES.block_size) + pad(data, AES.block_size))
+
+    def _decrypt_bytes(self, encrypted_data: bytes) -> bytes:
+        """解密IV+密文格式的二进制数据"""
+        if len(encrypted_data) < 2 * AES.block_size or len(encrypted_data) % AES.block_size:
+            raise ValueError("加密数据长度无效")
+        decrypted = self._decrypt_cipher.decrypt(encrypted_data)
+        return unpad(decrypted[AES.block_size:], AES.block_size)
+
+    def encrypt_many(self, datas: List[bytes]) -> List[str]:
+        """批量加密多条二进制数据，所有记录拼接后只调用一次底层加密
+
+        每条记录各自填充并以随机块开头，拼接后沿CBC链一次加密，再按长度切分，
+        结果与逐条调用encrypt_data后Base64编码的格式完全相同。
 
         Args:
-            encrypted_data: Base64编码的加密URL
+            datas: 要加密的二进制数据列表
 
         Returns:
-            解密后的URL字符串，失败时返回空字符串
+            List[str]: 与输入一一对应的Base64编码加密数据（包含IV）
         """
-        try:
-            # 解码Base64数据
-            binary_data = base64.b64decode(encrypted_data)
-            decrypted_bytes = self._decrypt_bytes(binary_data)
-            return decrypted_bytes.decode('utf-8')
-        except (binascii.Error, ValueError, TypeError, IndexError, UnicodeDecodeError) as e:
-            logger.error(f"解密URL时出错: {e}")
-            return ""
-
-    def encrypt_data(self, data: bytes) -> bytes:
-        """加密任意二进制数据
+        if not datas:
+            return []
+
+        block_size = AES.block_size
+        random_blocks = get_random_bytes(block_size * len(datas))
+        padded = [pad(data, block_size) for data in datas]
+        encrypted = self._encrypt_cipher.encrypt(b''.join(
+            random_blocks[i * block_size:(i + 1) * block_size] + data
+            for i, data in enumerate(padded)
+        ))
+
+        results = []
+        offset = 0
+        for data in padded:
+            end = offset + block_size + len(data)
+            results.append(_b64encode(encrypted[offset:end]))
+            offset = end
+        return results
+
+    def encrypt_json_many(self, objs: List[Any]) -> List[str]:
+        """批量将对象序列化为JSON后加密，结果与逐条调用encrypt_json相同格式
 
         Args:
-            data: 要加密的二进制数据
+            objs: 可JSON序列化的对象列表
 
         Returns:
-            加密后的数据（包含IV）
+            List[str]: 与输入一一对应的Base64编码加密数据（包含IV）
         """
-        return self._encrypt_bytes(data)
+        return self.encrypt_many([json_dumps(obj) for obj in objs])
 
-    def decrypt_data(self, encrypted_data: bytes) -> str:
-        """解密二进制数据
+    def decrypt_many(self, encrypted_values: List[str]) -> List[Optional[bytes]]:
+        """批量解密Base64编码的IV+密文，所有记录拼接后只调用一次底层解密
+
+        CBC解密时每个明文块只依赖对应密文块及其前一块，拼接后除各记录首块（即IV，
+        本就丢弃）外，其余明文与逐条解密完全一致。
 
         Args:
-            encrypted_data: 加密后的二进制数据（包含IV）
+            encrypted_values: Base64编码的加密数据列表
 
         Returns:
-            解密后的文本，失败时返回空字符串
+            List[Optional[bytes]]: 与输入一一对应的明文，格式或填充无效的记录为None
         """
-        try:
-            decrypted_bytes = self._decrypt_bytes(encrypted_data)
-            return decrypted_bytes.decode('utf-8')
-        except (ValueError, IndexError, UnicodeDecodeError) as e:
-            logger.error(f"解密数据时出错: {e}")
-            return ""
+        block_size = AES.block_size
+        chunks = []
+        for value in encrypted_values:
+            try:
+                raw = _b64decode(value)
+            except (binascii.Error, ValueError, TypeError):
+                raw = b''
+            if len(raw) < 2 * block_size or len(raw) % block_size:
+                raw = b''
+            chunks.append(raw)
+
+        buffer = b''.join(chunks)
+        decrypted = self._decrypt_cipher.decrypt(buffer) if buffer else b''
+
+        results: List[Optional[bytes]] = []
+        offset = 0
+        for raw in chunks:
+            if not raw:
+                results.append(None)
+                continue
+            end = offset + len(raw)
+            try:
+                results.append(unpad(decrypted[offset + block_size:end], block_size))
+            except ValueError:
+                results.append(None)
+            offset = end
+        return results
+
 
 # 创建全局加密器实例
 encryptor = Encryptor()
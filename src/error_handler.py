@@ -5,21 +5,35 @@
 避免过度捕获异常，确保错误正确传播
 """
 
+import atexit
 import logging
+import queue
+import reprlib
+import sys
+import time
 import traceback
 import functools
-from typing import Any, Callable, Dict, List, Optional, Type, Union
+from collections import Counter, deque
+from itertools import islice
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Type, Union
 from abc import ABC, abstractmethod
 from enum import Enum
 from dataclasses import dataclass
 from datetime import datetime
 
+import requests
+
 logger = logging.getLogger(__name__)
 
 # Interface Segregation Principle - 分离错误处理接口
 class IErrorHandler(ABC):
     """错误处理器接口"""
     
+    # 默认处理器在此声明可处理的类型，ErrorManager据此通过singledispatch按类型分派；
+    # 自定义处理器通过can_handle按错误实例判断
+    HANDLED_TYPES: Optional[Tuple[Type[BaseException], ...]] = None
+    
     @abstractmethod
     def can_handle(self, error: Exception) -> bool:
         """判断是否能处理该错误"""
@@ -52,41 +66,50 @@ class ErrorInfo:
     error: Exception
     severity: ErrorSeverity
     context: Dict[str, Any]
-    timestamp: datetime
+    timestamp: float  # time.time()时间戳，序列化时再格式化
     module: str
     function: str
     recoverable: bool = True
     
-    def to_dict(self) -> Dict[str, Any]:
-        """转换为字典"""
-        return {
+    def to_dict(self, include_traceback: bool = False) -> Dict[str, Any]:
+        """转换为字典
+
+        Args:
+            include_traceback: 是否包含格式化的异常堆栈，格式化开销较大，仅在需要展示时开启
+
+        Returns:
+            Dict[str, Any]: 错误信息字典
+        """
+        result = {
             'error_type': type(self.error).__name__,
             'error_message': str(self.error),
             'severity': self.severity.value,
             'context': self.context,
-            'timestamp': self.timestamp.isoformat(),
+            'timestamp': datetime.fromtimestamp(self.timestamp).isoformat(),
             'module': self.module,
             'function': self.function,
-            'recoverable': self.recoverable,
-            'traceback': traceback.format_exception(type(self.error), self.error, self.error.__traceback__)
+            'recoverable': self.recoverable
         }
+        if include_traceback:
+            result['traceback'] = traceback.format_exception(type(self.error), self.error, self.error.__traceback__)
+        return result
 
 # Single Responsibility Principle - 具体错误处理器
 class NetworkErrorHandler(IErrorHandler):
     """网络错误处理器 - 单一职责：处理网络相关错误"""
     
+    HANDLED_TYPES = (
+        requests.exceptions.RequestException,
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+        requests.exceptions.HTTPError,
+        ConnectionError,
+        TimeoutError
+    )
+    
     def can_handle(self, error: Exception) -> bool:
         """判断是否为网络错误"""
-        import requests
-        network_errors = (
-            requests.exceptions.RequestException,
-            requests.exceptions.ConnectionError,
-            requests.exceptions.Timeout,
-            requests.exceptions.HTTPError,
-            ConnectionError,
-            TimeoutError
-        )
-        return isinstance(error, network_errors)
+        return isinstance(error, self.HANDLED_TYPES)
     
     def handle_error(self, error: Exception, context: Dict[str, Any]) -> Any:
         """处理网络错误"""
@@ -95,7 +118,7 @@ class NetworkErrorHandler(IErrorHandler):
                 error=error,
                 severity=ErrorSeverity.HIGH,
                 context=context,
-                timestamp=datetime.now(),
+                timestamp=time.time(),
                 module=context.get('module', 'unknown'),
                 function=context.get('function', 'unknown'),
                 recoverable=True
@@ -105,7 +128,7 @@ class NetworkErrorHandler(IErrorHandler):
                 error=error,
                 severity=ErrorSeverity.MEDIUM,
                 context=context,
-                timestamp=datetime.now(),
+                timestamp=time.time(),
                 module=context.get('module', 'unknown'),
                 function=context.get('function', 'unknown'),
                 recoverable=True
@@ -114,16 +137,17 @@ class NetworkErrorHandler(IErrorHandler):
 class FileSystemErrorHandler(IErrorHandler):
     """文件系统错误处理器 - 单一职责：处理文件系统错误"""
     
+    HANDLED_TYPES = (
+        FileNotFoundError,
+        PermissionError,
+        IsADirectoryError,
+        OSError,
+        IOError
+    )
+    
     def can_handle(self, error: Exception) -> bool:
         """判断是否为文件系统错误"""
-        file_errors = (
-            FileNotFoundError,
-            PermissionError,
-            IsADirectoryError,
-            OSError,
-            IOError
-        )
-        return isinstance(error, file_errors)
+        return isinstance(error, self.HANDLED_TYPES)
     
     def handle_error(self, error: Exception, context: Dict[str, Any]) -> Any:
         """处理文件系统错误"""
@@ -141,7 +165,7 @@ class FileSystemErrorHandler(IErrorHandler):
             error=error,
             severity=severity,
             context=context,
-            timestamp=datetime.now(),
+            timestamp=time.time(),
             module=context.get('module', 'unknown'),
             function=context.get('function', 'unknown'),
             recoverable=recoverable
@@ -150,15 +174,16 @@ class FileSystemErrorHandler(IErrorHandler):
 class DataValidationErrorHandler(IErrorHandler):
     """数据验证错误处理器 - 单一职责：处理数据验证错误"""
     
+    HANDLED_TYPES = (
+        ValueError,
+        TypeError,
+        KeyError,
+        AttributeError
+    )
+    
     def can_handle(self, error: Exception) -> bool:
         """判断是否为数据验证错误"""
-        validation_errors = (
-            ValueError,
-            TypeError,
-            KeyError,
-            AttributeError
-        )
-        return isinstance(error, validation_errors)
+        return isinstance(error, self.HANDLED_TYPES)
     
     def handle_error(self, error: Exception, context: Dict[str, Any]) -> Any:
         """处理数据验证错误"""
@@ -173,14 +198,18 @@ class DataValidationErrorHandler(IErrorHandler):
             error=error,
             severity=severity,
             context=context,
-            timestamp=datetime.now(),
+            timestamp=time.time(),
             module=context.get('module', 'unknown'),
             function=context.get('function', 'unknown'),
             recoverable=recoverable
         )
 
 class GenericErrorHandler(IErrorHandler):
-    """通用错误处理器 - 处理未分类的错误"""
+    """通用错误处理器 - 处理未分类的错误
+
+    不声明HANDLED_TYPES：它是ErrorManager在默认处理器和自定义处理器都不匹配时的兜底，
+    不参与按类型分派。
+    """
     
     def can_handle(self, error: Exception) -> bool:
         """可以处理任何错误"""
@@ -192,12 +221,30 @@ class GenericErrorHandler(IErrorHandler):
             error=error,
             severity=ErrorSeverity.CRITICAL,
             context=context,
-            timestamp=datetime.now(),
+            timestamp=time.time(),
             module=context.get('module', 'unknown'),
             function=context.get('function', 'unknown'),
             recoverable=False
         )
 
+def _build_handler_dispatcher(handlers: List[IErrorHandler]) -> Callable[[BaseException], Optional[IErrorHandler]]:
+    """根据处理器声明的HANDLED_TYPES构建按异常类型分派的函数
+
+    singledispatch按异常类型的MRO选择最具体的注册类型，并在内部缓存每个类型的解析结果。
+
+    Args:
+        handlers: 按优先级排列的处理器列表
+
+    Returns:
+        接收错误实例、返回对应处理器（无匹配时为None）的分派函数
+    """
+    dispatch = functools.singledispatch(lambda error: None)
+    # 逆序注册，同一类型被多个处理器声明时由优先级高的处理器覆盖
+    for handler in reversed(handlers):
+        for exc_type in handler.HANDLED_TYPES or ():
+            dispatch.register(exc_type, lambda error, _handler=handler: _handler)
+    return dispatch
+
 # Open/Closed Principle - 可扩展的错误管理器
 class ErrorManager:
     """错误管理器 - 协调各种错误处理器"""
@@ -205,8 +252,16 @@ class ErrorManager:
     def __init__(self):
         self._handlers: List[IErrorHandler] = []
         self._reporters: List[IErrorReporter] = []
-        self._error_history: List[ErrorInfo] = []
         self._max_history_size = 1000
+        # 定长双端队列，超出上限时自动丢弃最旧的记录
+        self._error_history: Deque[ErrorInfo] = deque(maxlen=self._max_history_size)
+        # 与历史记录同步维护的计数，统计时无需遍历历史
+        self._severity_counts: Counter = Counter()
+        self._error_type_counts: Counter = Counter()
+        # 通过add_handler添加的自定义处理器，在默认处理器之后按顺序判断
+        self._custom_handlers: List[IErrorHandler] = []
+        # 是否保留错误历史，频繁处理错误且不需要统计的调用方可关闭
+        self._record_history = True
         
         # 注册默认处理器（按优先级排序）
         self._register_default_handlers()
@@ -216,19 +271,36 @@ class ErrorManager:
         self._handlers = [
             NetworkErrorHandler(),
             FileSystemErrorHandler(),
-            DataValidationErrorHandler(),
-            GenericErrorHandler()  # 放在最后作为兜底
+            DataValidationErrorHandler()
         ]
+        # 通用处理器单独保存，作为所有处理器都不匹配时的兜底
+        self._fallback_handler: IErrorHandler = GenericErrorHandler()
+        self._default_handler_for = _build_handler_dispatcher(self._handlers)
     
     def add_handler(self, handler: IErrorHandler) -> None:
-        """添加自定义错误处理器"""
-        # 插入到通用处理器之前
-        self._handlers.insert(-1, handler)
+        """添加自定义错误处理器（优先级低于默认处理器，高于通用兜底处理器）"""
+        self._custom_handlers.append(handler)
+    
+    def _find_handler(self, error: Exception) -> IErrorHandler:
+        """查找处理该错误的处理器：默认处理器按类型分派，自定义处理器按添加顺序逐个判断"""
+        handler = self._default_handler_for(error)
+        if handler is not None:
+            return handler
+        
+        for handler in self._custom_handlers:
+            if handler.can_handle(error):
+                return handler
+        # 如果没有处理器能处理，使用通用处理器
+        return self._fallback_handler
     
     def add_reporter(self, reporter: IErrorReporter) -> None:
         """添加错误报告器"""
         self._reporters.append(reporter)
     
+    def set_record_history(self, enabled: bool) -> None:
+        """设置是否保留错误历史（关闭后get_error_statistics不再包含新错误）"""
+        self._record_history = enabled
+    
     def handle_error(self, error: Exception, context: Optional[Dict[str, Any]] = None) -> ErrorInfo:
         """处理错误"""
         if context is None:
@@ -236,76 +308,87 @@ class ErrorManager:
         
         # 添加调用栈信息到上下文
         if 'module' not in context or 'function' not in context:
-            frame = traceback.extract_stack()[-3]  # 获取调用者信息
-            context.setdefault('module', frame.filename.split('/')[-1])
-            context.setdefault('function', frame.name)
+            # 只取需要的那一帧（与原extract_stack()[-3]相同），不遍历和格式化整个调用栈
+            try:
+                code = sys._getframe(2).f_code
+                context.setdefault('module', code.co_filename.rpartition('/')[2])
+                context.setdefault('function', code.co_name)
+            except ValueError:  # 调用栈深度不足
+                context.setdefault('module', 'unknown')
+                context.setdefault('function', 'unknown')
         
         # 找到合适的处理器
-        error_info = None
-        for handler in self._handlers:
-            if handler.can_handle(error):
-                error_info = handler.handle_error(error, context)
-                break
-        
-        if error_info is None:
-            # 如果没有处理器能处理，使用通用处理器
-            error_info = self._handlers[-1].handle_error(error, context)
+        error_info = self._find_handler(error).handle_error(error, context)
         
         # 记录错误历史
-        self._add_to_history(error_info)
+        if self._record_history:
+            self._add_to_history(error_info)
         
-        # 报告错误
-        for reporter in self._reporters:
-            try:
-                reporter.report_error(error_info)
-            except Exception as report_error:
-                logger.error(f"错误报告器失败: {report_error}")
+        # 报告错误（未注册报告器时跳过）
+        if self._reporters:
+            for reporter in self._reporters:
+                try:
+                    reporter.report_error(error_info)
+                except Exception as report_error:
+                    logger.error(f"错误报告器失败: {report_error}")
         
         return error_info
     
     def _add_to_history(self, error_info: ErrorInfo) -> None:
-        """添加到错误历史"""
-        self._error_history.append(error_info)
-        
-        # 限制历史记录大小
-        if len(self._error_history) > self._max_history_size:
-            self._error_history = self._error_history[-self._max_history_size:]
+        """添加到错误历史，并同步更新计数"""
+        history = self._error_history
+        if len(history) == history.maxlen:
+            # 队列已满，append会挤出最旧的记录，先扣减其计数
+            evicted = history[0]
+            self._discount(self._severity_counts, evicted.severity.value)
+            self._discount(self._error_type_counts, type(evicted.error).__name__)
+        history.append(error_info)
+        self._severity_counts[error_info.severity.value] += 1
+        self._error_type_counts[type(error_info.error).__name__] += 1
+    
+    @staticmethod
+    def _discount(counts: Counter, key: str) -> None:
+        """计数减一，归零时删除键以保持与历史记录一致"""
+        remaining = counts[key] - 1
+        if remaining:
+            counts[key] = remaining
+        else:
+            del counts[key]
     
     def get_error_statistics(self) -> Dict[str, Any]:
         """获取错误统计信息"""
         if not self._error_history:
             return {'total_errors': 0}
         
-        severity_counts = {}
-        error_type_counts = {}
-        
-        for error_info in self._error_history:
-            # 统计严重性
-            severity = error_info.severity.value
-            severity_counts[severity] = severity_counts.get(severity, 0) + 1
-            
-            # 统计错误类型
-            error_type = type(error_info.error).__name__
-            error_type_counts[error_type] = error_type_counts.get(error_type, 0) + 1
-        
         return {
             'total_errors': len(self._error_history),
-            'severity_counts': severity_counts,
-            'error_type_counts': error_type_counts,
-            'recent_errors': [info.to_dict() for info in self._error_history[-5:]]
+            'severity_counts': dict(self._severity_counts),
+            'error_type_counts': dict(self._error_type_counts),
+            'recent_errors': [info.to_dict(include_traceback=True) for info in islice(reversed(self._error_history), 5)][::-1]
         }
 
 class LoggingErrorReporter(IErrorReporter):
     """日志错误报告器 - 将错误记录到日志"""
+
+    # 严重程度到日志级别的映射，类级别共享避免每次报告都重建字典
+    _LEVELS = {
+        ErrorSeverity.LOW: logging.INFO,
+        ErrorSeverity.MEDIUM: logging.WARNING,
+        ErrorSeverity.HIGH: logging.ERROR,
+        ErrorSeverity.CRITICAL: logging.CRITICAL
+    }
+    
+    def __init__(self, reporter_logger: Optional[logging.Logger] = None):
+        """初始化报告器
+
+        Args:
+            reporter_logger: 用于输出的日志器，默认使用本模块日志器（同步输出）
+        """
+        self._logger = reporter_logger or logger
     
     def report_error(self, error_info: ErrorInfo) -> None:
         """报告错误到日志"""
-        log_level = {
-            ErrorSeverity.LOW: logging.INFO,
-            ErrorSeverity.MEDIUM: logging.WARNING,
-            ErrorSeverity.HIGH: logging.ERROR,
-            ErrorSeverity.CRITICAL: logging.CRITICAL
-        }.get(error_info.severity, logging.ERROR)
+        log_level = self._LEVELS.get(error_info.severity, logging.ERROR)
         
         message = (
             f"[{error_info.severity.value.upper()}] "
@@ -313,11 +396,34 @@ class LoggingErrorReporter(IErrorReporter):
             f"in {error_info.module}:{error_info.function}"
         )
         
-        logger.log(log_level, message, extra={
+        self._logger.log(log_level, message, extra={
             'error_context': error_info.context,
             'recoverable': error_info.recoverable
         })
 
+class _ForwardHandler(logging.Handler):
+    """在监听线程中把日志记录转交给本模块日志器，沿用其处理器和传播配置"""
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        logger.handle(record)
+
+# 错误报告的后台监听器，错误集中爆发时格式化和写日志不阻塞出错的调用线程
+_reporter_listener: Optional[QueueListener] = None
+
+def _get_queued_reporter_logger() -> logging.Logger:
+    """获取经由队列异步输出的报告日志器，首次调用时启动后台监听线程"""
+    global _reporter_listener
+    reporter_logger = logging.getLogger(f'{__name__}.reporter')
+    if _reporter_listener is None:
+        log_queue = queue.SimpleQueue()
+        reporter_logger.addHandler(QueueHandler(log_queue))
+        reporter_logger.propagate = False
+        _reporter_listener = QueueListener(log_queue, _ForwardHandler())
+        _reporter_listener.start()
+        # 进程退出前处理完队列中剩余的记录
+        atexit.register(_reporter_listener.stop)
+    return reporter_logger
+
 # 全局错误管理器实例
 _error_manager: Optional[ErrorManager] = None
 
@@ -326,37 +432,77 @@ def get_error_manager() -> ErrorManager:
     global _error_manager
     if _error_manager is None:
         _error_manager = ErrorManager()
-        _error_manager.add_reporter(LoggingErrorReporter())
+        _error_manager.add_reporter(LoggingErrorReporter(_get_queued_reporter_logger()))
     return _error_manager
 
+# handle_errors包装函数需要复制的属性（不合并__dict__）
+_WRAPPER_ASSIGNMENTS = ('__module__', '__name__', '__qualname__', '__doc__')
+# 错误上下文中参数摘要的最大长度
+_ARGS_REPR_LIMIT = 200
+# 生成参数摘要的有界repr：容器只展开前几项、字符串和其他对象截断，
+# 避免为大参数（URL列表、关键词字典等）先构建完整repr再截断
+_ARGS_REPR = reprlib.Repr()
+_ARGS_REPR.maxlevel = 3
+_ARGS_REPR.maxstring = 80
+_ARGS_REPR.maxother = 80
+_ARGS_REPR.maxlong = 40
+_ARGS_REPR.maxtuple = _ARGS_REPR.maxlist = _ARGS_REPR.maxarray = 10
+_ARGS_REPR.maxdict = _ARGS_REPR.maxset = _ARGS_REPR.maxfrozenset = _ARGS_REPR.maxdeque = 10
+
 # 装饰器 - 自动错误处理
 def handle_errors(
     severity: ErrorSeverity = ErrorSeverity.MEDIUM,
     recoverable: bool = True,
     re_raise: bool = False,
-    default_return: Any = None
+    default_return: Any = None,
+    capture_args: bool = False
 ):
-    """错误处理装饰器"""
+    """错误处理装饰器
+
+    Args:
+        severity: 错误严重程度
+        recoverable: 是否可恢复
+        re_raise: 处理后是否重新抛出异常
+        default_return: 未重新抛出时的返回值
+        capture_args: 是否在错误上下文中保留完整的args/kwargs，默认只保留截断的摘要
+    """
     def decorator(func: Callable) -> Callable:
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                context = {
-                    'module': func.__module__,
-                    'function': func.__name__,
-                    'args': args,
-                    'kwargs': kwargs
-                }
-                
-                error_manager = get_error_manager()
-                error_info = error_manager.handle_error(e, context)
-                
-                if re_raise or error_info.severity == ErrorSeverity.CRITICAL:
+        # 模块名和函数名在装饰时确定，异常分支只需构建一次小字典
+        module_name = func.__module__
+        function_name = func.__name__
+        wraps = functools.wraps(func, assigned=_WRAPPER_ASSIGNMENTS, updated=())
+
+        def _handle(e: Exception, args: tuple, kwargs: dict) -> ErrorInfo:
+            context = {
+                'module': module_name,
+                'function': function_name
+            }
+            if capture_args:
+                context['args'] = args
+                context['kwargs'] = kwargs
+            else:
+                # 只保留有界的摘要，避免大载荷沿报告器被格式化/序列化
+                context['args'] = _ARGS_REPR.repr(args)[:_ARGS_REPR_LIMIT]
+                context['kwargs'] = sorted(kwargs)
+            return get_error_manager().handle_error(e, context)
+
+        if re_raise:
+            @wraps
+            def wrapper(*args, **kwargs):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    _handle(e, args, kwargs)
                     raise
-                
-                return default_return
+        else:
+            @wraps
+            def wrapper(*args, **kwargs):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    if _handle(e, args, kwargs).severity == ErrorSeverity.CRITICAL:
+                        raise
+                    return default_return
         
         return wrapper
     return decorator
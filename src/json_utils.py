@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON序列化工具模块
+orjson可用时优先使用，未安装时回退到标准库json，两者输出格式一致
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，未安装时回退到标准库json
+    orjson = None
+
+
+def json_dumps(obj: Any) -> bytes:
+    """序列化为紧凑的UTF-8 JSON字节
+
+    Args:
+        obj: 待序列化的对象
+
+    Returns:
+        bytes: 紧凑格式（无多余空格、不转义非ASCII字符）的JSON字节
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    """反序列化JSON字节或字符串
+
+    Args:
+        data: JSON字节或字符串
+
+    Returns:
+        Any: 解析结果
+
+    Raises:
+        ValueError: JSON格式或编码无效（两种实现的解码异常均为ValueError的子类）
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -5,34 +5,122 @@
 处理与关键词API的交互
 """
 
-import json
+import functools
 import logging
+import threading
 import time
-from typing import Dict, List, Any, Optional, Union
-from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional, Tuple, Union
+from itertools import chain, islice
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from urllib.parse import quote, urlparse
 
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from src.config import config
 from src.data_manager import data_manager
 from src.api_health_monitor import api_health_monitor
+from src.keyword_extractor import keyword_extractor
+from src.json_utils import json_loads
+from src.privacy_utils import PrivacyMasker
+from src.thread_safe_manager import TTLCache
 
 # 配置日志
 logger = logging.getLogger('content_watcher.keyword_api')
 
+# 需要重试的HTTP状态码
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# 同一关键词串/URL在失败、重试和调试日志中会被反复脱敏，缓存脱敏结果
+_mask_keyword = functools.lru_cache(maxsize=2048)(PrivacyMasker.mask_keyword)
+_mask_api_url = functools.lru_cache(maxsize=256)(PrivacyMasker.mask_api_url)
+
+def dedupe_keywords(keywords: Iterable[str],
+                    key: Callable[[str], str] = keyword_extractor.normalize_keyword) -> Dict[str, str]:
+    """按规范化形式对关键词去重
+
+    Args:
+        keywords: 原始关键词
+        key: 规范化函数，返回空字符串的关键词视为无效并丢弃
+
+    Returns:
+        Dict[str, str]: 规范化关键词 -> 原始关键词（同组中首次出现的写法，按首次出现顺序）
+    """
+    unique_keywords: Dict[str, str] = {}
+    for kw in keywords:
+        normalized_kw = key(kw)
+        if normalized_kw and normalized_kw not in unique_keywords:
+            unique_keywords[normalized_kw] = kw
+    return unique_keywords
+
+# 关键词查询结果缓存，所有客户端共享，键为规范化关键词
+_keyword_cache: TTLCache = TTLCache(max_size=config.keyword_cache_max_size, ttl=config.keyword_cache_ttl)
+
+# 按主机共享的并发请求许可
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+_host_slots_lock = threading.Lock()
+
+def _get_host_slot(host: str) -> threading.BoundedSemaphore:
+    """获取主机的并发请求许可，同一主机上的所有客户端合计并发不超过KEYWORDS_CONCURRENCY
+
+    Args:
+        host: API主机（host:port）
+
+    Returns:
+        threading.BoundedSemaphore: 该主机共享的信号量
+    """
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(max(1, config.keywords_concurrency))
+        return slot
+
+def create_keyword_adapter(pool_maxsize: Optional[int] = None) -> HTTPAdapter:
+    """创建关键词API使用的HTTP适配器
+
+    适配器按host:port维护连接池，挂载到多个会话时，指向同一主机的客户端共享连接。
+
+    Args:
+        pool_maxsize: 每个主机保持的最大连接数，默认按批次并发数留足余量
+
+    Returns:
+        HTTPAdapter: 配置了重试策略和连接池大小的适配器
+    """
+    # 429/5xx和连接错误由urllib3在适配器内部重试，按带抖动的指数退避并遵循服务端的Retry-After
+    retry = Retry(
+        total=config.api_retry_max,
+        backoff_factor=1.5,
+        backoff_max=60,
+        # 随机抖动，避免多个线程同时被限流后在同一时刻重试
+        backoff_jitter=1.0,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    # 连接池不小于并发请求数，避免多线程查询时连接被丢弃后重新握手
+    if pool_maxsize is None:
+        pool_maxsize = max(32, config.keywords_concurrency * 2)
+    return HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=pool_maxsize)
+
 class KeywordAPI:
     """处理与关键词API的交互
 
     合并了KeywordAPI和KeywordAPIClient的功能，提供统一的API交互接口
     """
 
-    def __init__(self, api_url=None, headers=None, timeout=None):
+    def __init__(self, api_url=None, headers=None, timeout=None, pool_maxsize=None, adapter=None):
         """初始化API交互器
 
         Args:
             api_url: API基础URL，如果为None则从配置中获取第一个
             headers: 请求头，默认为None
             timeout: 请求超时时间，默认使用配置值
+            pool_maxsize: 每个主机保持的最大连接数，默认按批次并发数留足余量
+            adapter: 共享的HTTP适配器（见create_keyword_adapter），多个客户端共用同一连接池；
+                传入时忽略pool_maxsize
         """
         self.api_url = api_url or (config.keywords_api_urls[0] if config.keywords_api_urls and len(config.keywords_api_urls) > 0 else '')
         self.headers = headers or {}
@@ -42,32 +130,41 @@ class KeywordAPI:
         self.timeout = timeout or config.keyword_query_timeout  # 使用配置的超时时间
         self.logger = logging.getLogger('content_watcher.keyword_api')
 
-        # API健康状态跟踪 - 新增
-        self.consecutive_failures = 0
-        self.last_success_time = time.time()
-        self.is_circuit_open = False
-        self.circuit_open_time = None
-
         # 创建一个会话对象，用于复用连接
         self.session = requests.Session()
         # 设置默认请求头
         self.session.headers.update(self.headers)
+        # 未传入共享适配器时创建独立的连接池
+        if adapter is None:
+            adapter = create_keyword_adapter(pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # 同一主机的并发请求许可
+        parsed_url = urlparse(self.api_url)
+        self._host_slot = _get_host_slot(parsed_url.netloc)
+        # 日志中使用的脱敏地址和域名，只在初始化时计算一次
+        self._masked_api_url = _mask_api_url(self.api_url)
+        self._masked_domain = PrivacyMasker.mask_domain(parsed_url.hostname or '')
 
         # 注册到健康监控器
         if self.api_url:
             api_health_monitor.register_api(self.api_url)
 
-    def get_keyword_data(self, keywords: Union[str, List[str]], max_retries: int = 2) -> Dict[str, Any]:
+    def get_keyword_data(self, keywords: Union[str, List[str]], max_retries: int = 2,
+                         keyword_count: Optional[int] = None) -> Dict[str, Any]:
         """获取关键词数据
         Args:
             keywords: 关键词字符串或列表
             max_retries: 最大重试次数
+            keyword_count: 关键词数量，调用方已知时传入以免重复拆分字符串
 
         Returns:
             关键词数据字典
         """
         # 如果输入是列表，转换为逗号分隔的字符串
         if isinstance(keywords, list):
+            keyword_count = len(keywords)
             keywords = ",".join(keywords)
 
         # 如果没有关键词或API URL，返回None表示无法查询
@@ -76,12 +173,13 @@ class KeywordAPI:
             return None
 
         # 尝试从API获取数据
-        result = self._fetch_from_api(keywords, max_retries)
+        if keyword_count is None:
+            keyword_count = keywords.count(',') + 1
+        result = self._fetch_from_api(keywords, keyword_count, max_retries)
 
         # 如果API调用失败，返回None而不是创建虚假数据
         if not result or result.get('status') != 'success':
-            from src.privacy_utils import PrivacyMasker
-            masked_keywords = PrivacyMasker.mask_keyword(keywords)
+            masked_keywords = _mask_keyword(keywords)
             self.logger.warning(f"无法从API获取关键词数据，跳过: {masked_keywords}")
             return None
 
@@ -100,53 +198,41 @@ class KeywordAPI:
         if not keywords_list or not self.api_url:
             return {}
 
-        # 对关键词列表进行去重，避免重复查询
-        # 使用字典而不是列表来存储关键词，提高查找效率
-        from src.keyword_extractor import keyword_extractor
-        unique_keywords = {}
-        for kw in keywords_list:
-            normalized_kw = keyword_extractor.normalize_keyword(kw)
-            if normalized_kw:  # 只处理有效的关键词
-                unique_keywords[normalized_kw] = kw  # 使用规范化关键词作为键，原始关键词作为值
+        # 对关键词列表进行去重，避免重复查询；无效关键词被丢弃
+        unique_keywords = dedupe_keywords(keywords_list)
 
-        self.logger.debug(f"关键词去重: 原始数量 {len(keywords_list)}, 去重后数量 {len(unique_keywords)}")
+        # 命中缓存的关键词直接复用，只查询缺失部分
+        cached = _keyword_cache.get_many(unique_keywords)
+        keyword_data = {item['keyword']: item for item in cached.values()}
+        pending_keywords = [kw for normalized_kw, kw in unique_keywords.items() if normalized_kw not in cached]
+        # 本次从API取回的数据，按规范化关键词写入缓存
+        fetched = {}
+
+        # 调试日志使用%格式延迟格式化；逐条关键词的日志还需脱敏，仍按开关整体跳过
+        debug_on = self.logger.isEnabledFor(logging.DEBUG)
+        self.logger.debug("关键词去重: 原始数量 %d, 去重后数量 %d, 缓存命中 %d",
+                          len(keywords_list), len(unique_keywords), len(cached))
 
-        keyword_data = {}
         # 使用配置中的批处理大小，而不是硬编码
         batch_size = config.keywords_batch_size
         
         # 记录批处理配置信息（仅调试级别）
-        if self.logger.isEnabledFor(logging.DEBUG):
-            self.logger.debug(f"使用批处理大小: {batch_size}")
-
-        # 使用队列来管理关键词批次，便于失败重试
-        keyword_queue = deque()
+        self.logger.debug("使用批处理大小: %d", batch_size)
 
-        # 将关键词分批加入队列
-        unique_kw_list = list(unique_keywords.values())
-        for i in range(0, len(unique_kw_list), batch_size):
-            batch = unique_kw_list[i:i + batch_size]
-            keyword_queue.append(batch)
+        # 直接从去重列表的迭代器按批切分，不再复制中间列表
+        keyword_values = iter(pending_keywords)
+        keyword_batches = iter(lambda: list(islice(keyword_values, batch_size)), [])
 
         # 记录批次信息（仅调试级别）
-        if self.logger.isEnabledFor(logging.DEBUG):
-            self.logger.debug(f"创建 {len(keyword_queue)} 个批次，每批最多 {batch_size} 个关键词")
-
-        # 记录失败的关键词批次，用于最终报告
-        failed_batches = []
-
-        # 处理队列中的所有批次
-        while keyword_queue:
-            batch = keyword_queue.popleft()
-            combined_keywords = ",".join(batch)
-
-            # 验证批次大小是否符合配置
-            if len(batch) > config.keywords_batch_size:
-                self.logger.warning(f"批次大小({len(batch)})超过配置限制({config.keywords_batch_size})")
+        self.logger.debug("创建 %d 个批次，每批最多 %d 个关键词",
+                          -(-len(pending_keywords) // batch_size), batch_size)
 
-            # 获取批次数据
-            batch_result = self.get_keyword_data(combined_keywords, max_retries)
+        # 失败批次及其关键词数量，用于最终报告
+        failed_batch_count = 0
+        failed_keyword_count = 0
 
+        # 处理所有批次：各批次相互独立，按配置的并发数同时请求，按完成顺序合并结果
+        for batch, batch_result in self._iter_batch_results(keyword_batches, max_retries):
             if batch_result and batch_result.get('status') == 'success' and 'data' in batch_result:
                 # 处理返回的数据
                 for item in batch_result.get('data', []):
@@ -159,227 +245,171 @@ class KeywordAPI:
                     # 记录关键词数据 - 直接使用API返回的数据，不需要额外过滤
                     if keyword in keyword_data:
                         # 如果关键词已存在，更新数据
-                        keyword_data[keyword].update(item)
+                        keyword_data[keyword] |= item
                         # 只在调试级别输出成功日志
-                        if self.logger.isEnabledFor(logging.DEBUG):
-                            from src.privacy_utils import PrivacyMasker
-                            masked_keyword = PrivacyMasker.mask_keyword(keyword)
-                            self.logger.debug(f"更新关键词数据: {masked_keyword}")
+                        if debug_on:
+                            self.logger.debug("更新关键词数据: %s", _mask_keyword(keyword))
                     else:
                         keyword_data[keyword] = item
+                        normalized_kw = keyword_extractor.normalize_keyword(keyword)
+                        if normalized_kw:
+                            fetched[normalized_kw] = item
                         # 只在调试级别输出成功日志
-                        if self.logger.isEnabledFor(logging.DEBUG):
-                            from src.privacy_utils import PrivacyMasker
-                            masked_keyword = PrivacyMasker.mask_keyword(keyword)
-                            self.logger.debug(f"新增关键词数据: {masked_keyword}")
+                        if debug_on:
+                            self.logger.debug("新增关键词数据: %s", _mask_keyword(keyword))
 
                     # 记录月度数据数量 - 只在调试级别输出
-                    monthly_searches = item.get('metrics', {}).get('monthly_searches', [])
-                    if self.logger.isEnabledFor(logging.DEBUG):
-                        from src.privacy_utils import PrivacyMasker
-                        masked_keyword = PrivacyMasker.mask_keyword(keyword)
-                        self.logger.debug(f"成功获取关键词数据: {masked_keyword}, 包含 {len(monthly_searches)} 个月度数据")
+                    if debug_on:
+                        monthly_searches = item.get('metrics', {}).get('monthly_searches', [])
+                        self.logger.debug("成功获取关键词数据: %s, 包含 %d 个月度数据",
+                                          _mask_keyword(keyword), len(monthly_searches))
             else:
                 # 批次处理失败，记录失败信息
                 if batch_result is None:
                     self.logger.warning(f"批次查询返回None，跳过: {len(batch)} 个关键词")
                 else:
                     self.logger.warning(f"批次查询失败，跳过: {len(batch)} 个关键词")
-                failed_batches.append(batch)
+                failed_batch_count += 1
+                failed_keyword_count += len(batch)
 
                 # 记录失败的关键词，但不创建虚假数据
                 self.logger.warning(f"跳过 {len(batch)} 个查询失败的关键词")
 
         # 如果有失败的批次，记录总结信息
-        if failed_batches:
-            failed_count = sum(len(batch) for batch in failed_batches)
-            self.logger.warning(f"共有 {len(failed_batches)} 个批次 ({failed_count} 个关键词) 查询失败")
+        if failed_batch_count:
+            self.logger.warning(f"共有 {failed_batch_count} 个批次 ({failed_keyword_count} 个关键词) 查询失败")
+
+        # 只缓存查询成功的结果，失败的关键词下次仍会重新查询
+        if fetched:
+            _keyword_cache.put_many(fetched)
 
         return keyword_data
 
-    def _fetch_from_api(self, keywords: str, max_retries: int = None) -> Optional[Dict[str, Any]]:
-        """从API获取数据，处理重试逻辑 - 针对API 500错误优化
+    def _iter_batch_results(self, batches: Iterable[List[str]], max_retries: int) -> Iterator[Tuple[List[str], Optional[Dict[str, Any]]]]:
+        """查询各批次关键词，按完成顺序产出(批次, 查询结果)
+
+        并发数由KEYWORDS_CONCURRENCY控制，会话连接池线程安全；并发数为1时在当前线程依次查询。
+
+        Args:
+            batches: 关键词批次
+            max_retries: 最大重试次数
+
+        Yields:
+            Tuple[List[str], Optional[Dict[str, Any]]]: 批次及其查询结果
+        """
+        batches = iter(batches)
+        # 先取出至多并发数个批次；其余批次在有批次完成后再从生成器中取，不预先生成全部批次
+        initial_batches = [self._check_batch_size(batch) for batch in islice(batches, max(1, config.keywords_concurrency))]
+
+        if len(initial_batches) <= 1:
+            # 并发数为1或只有一个批次：在当前线程依次查询已取出的批次和生成器中剩余的批次
+            remaining = (self._check_batch_size(batch) for batch in batches)
+            for batch in chain(initial_batches, remaining):
+                yield batch, self.get_keyword_data(",".join(batch), max_retries, len(batch))
+            return
+
+        with ThreadPoolExecutor(max_workers=len(initial_batches), thread_name_prefix='keyword-batch') as executor:
+            def submit(batch: List[str]) -> None:
+                future = executor.submit(self.get_keyword_data, ",".join(batch), max_retries, len(batch))
+                pending[future] = batch
+
+            pending: Dict[Future, List[str]] = {}
+            for batch in initial_batches:
+                submit(batch)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = pending.pop(future)
+                    next_batch = next(batches, None)
+                    if next_batch is not None:
+                        submit(self._check_batch_size(next_batch))
+                    yield batch, future.result()
+
+    def _check_batch_size(self, batch: List[str]) -> List[str]:
+        """验证批次大小是否符合配置，超出时记录警告并原样返回批次"""
+        if len(batch) > config.keywords_batch_size:
+            self.logger.warning(f"批次大小({len(batch)})超过配置限制({config.keywords_batch_size})")
+        return batch
+
+    def _fetch_from_api(self, keywords: str, keyword_count: int,
+                        max_retries: int = None) -> Optional[Dict[str, Any]]:
+        """从API获取数据 - 429/5xx和连接错误的重试、退避及Retry-After由会话适配器处理
 
         Args:
             keywords: 关键词字符串
-            max_retries: 最大重试次数，默认使用配置值
+            keyword_count: 关键词数量
+            max_retries: 保留以兼容调用方，重试次数由会话适配器按配置统一控制
 
         Returns:
             API响应数据或None
         """
         # 检查API是否可用
         if not api_health_monitor.is_api_available(self.api_url):
-            from src.privacy_utils import PrivacyMasker
-            masked_url = PrivacyMasker.mask_api_url(self.api_url)
-            self.logger.warning(f"API不可用，跳过请求: {masked_url}")
+            self.logger.warning(f"API不可用，跳过请求: {self._masked_api_url}")
             return None
 
-        max_retries = max_retries or config.api_retry_max
-        retry_count = 0
-
-        while retry_count <= max_retries:
-            try:
-                # 构建请求URL
-                request_url = f"{self.api_url}{keywords}"
-                keyword_count = len(keywords.split(','))
-                self.logger.debug(f"请求关键词API，关键词数量: {keyword_count}")
-
-                # 使用自适应批处理大小验证
-                adaptive_batch_size = api_health_monitor.get_adaptive_batch_size(self.api_url)
-                if keyword_count > adaptive_batch_size:
-                    self.logger.warning(f"单次请求关键词数量({keyword_count})超出自适应限制({adaptive_batch_size})")
+        # 构建请求URL，关键词中的&、#、空格等需转义，仅保留逗号分隔符
+        request_url = f"{self.api_url}{quote(keywords, safe=',')}"
+        self.logger.debug("请求关键词API，域名: %s, 关键词数量: %d", self._masked_domain, keyword_count)
 
-                # 记录请求开始时间
-                request_start_time = time.time()
+        # 使用自适应批处理大小验证
+        adaptive_batch_size = api_health_monitor.get_adaptive_batch_size(self.api_url)
+        if keyword_count > adaptive_batch_size:
+            self.logger.warning(f"单次请求关键词数量({keyword_count})超出自适应限制({adaptive_batch_size})")
 
-                # 使用session发送请求，复用连接
-                response = self.session.get(
-                    request_url,
-                    timeout=self.timeout
-                )
-
-                # 计算响应时间
-                response_time = time.time() - request_start_time
+        # 同一主机的请求共享并发许可，多个客户端指向同一主机时总并发仍受限
+        with self._host_slot:
+            # 记录请求开始时间
+            request_start_time = time.time()
+            try:
+                # 使用session发送请求，复用连接；可重试的失败在适配器内部重试
+                # stream=True时响应体留在连接上，由下方直接读取解压后的字节
+                response = self.session.get(request_url, timeout=self.timeout, stream=True)
+            except requests.exceptions.RequestException as e:
+                masked_keywords = _mask_keyword(keywords)
+                self.logger.error(f"API请求异常，重试次数超过上限: {e.__class__.__name__}: {e}")
+                masked_url = _mask_api_url(request_url)
+                self.logger.error(f"异常的API URL: {masked_url}")
+                self.logger.error(f"请求的关键词: {masked_keywords} (共{keyword_count}个)")
+                api_health_monitor.record_request(self.api_url, False, time.time() - request_start_time)
+                return None
 
+            try:
                 # 处理响应
                 if response.status_code == 200:
                     try:
-                        result = response.json()
+                        # 从连接读取并解压响应体后直接解析，不经过response.content再缓存一份
+                        body = response.raw.read(decode_content=True)
+                    except urllib3.exceptions.HTTPError as e:  # 读取或解压响应体失败
+                        self.logger.error(f"读取API响应失败: {e.__class__.__name__}: {e}")
+                        api_health_monitor.record_request(self.api_url, False, time.time() - request_start_time)
+                        return None
+
+                    # 计算响应时间（包含适配器内部的重试和响应体下载）
+                    response_time = time.time() - request_start_time
+                    try:
+                        # orjson可用时比response.json()快得多
+                        result = json_loads(body)
                         # 记录成功请求到健康监控器
                         api_health_monitor.record_request(self.api_url, True, response_time)
                         return result
-                    except json.JSONDecodeError:
-                        from src.privacy_utils import PrivacyMasker
-                        masked_keywords = PrivacyMasker.mask_keyword(keywords)
+                    except ValueError:  # JSON格式或编码无效（JSONDecodeError是ValueError的子类）
+                        masked_keywords = _mask_keyword(keywords)
                         self.logger.error(f"API返回非JSON数据: {masked_keywords}")
                         # 记录失败请求到健康监控器
                         api_health_monitor.record_request(self.api_url, False, response_time)
                         return None
-                elif self._should_retry(response.status_code):
-                    retry_count += 1
-                    if retry_count <= max_retries:
-                        wait_time = self._calculate_wait_time(retry_count)
-                        # 显示关键词信息用于调试，但不输出完整关键词内容
-                        from src.privacy_utils import PrivacyMasker
-                        masked_keywords = PrivacyMasker.mask_keyword(keywords)
-                        self.logger.warning(f"API请求返回{response.status_code}，将在{wait_time:.1f}秒后重试")
-                        self.logger.warning(f"请求的关键词: {masked_keywords} (共{keyword_count}个)")
-
-                        # 记录失败请求到健康监控器
-                        api_health_monitor.record_request(self.api_url, False, response_time)
-
-                        # 使用自适应间隔以减少API压力
-                        adaptive_interval = api_health_monitor.get_adaptive_interval(self.api_url)
-                        time.sleep(wait_time + adaptive_interval)
-                        continue
 
                 # 显示失败信息，但不输出完整关键词内容
-                from src.privacy_utils import PrivacyMasker
-                masked_keywords = PrivacyMasker.mask_keyword(keywords)
+                masked_keywords = _mask_keyword(keywords)
                 self.logger.error(f"API请求失败: {response.status_code}")
                 self.logger.error(f"请求的关键词: {masked_keywords} (共{keyword_count}个)")
                 # 记录失败请求到健康监控器
-                api_health_monitor.record_request(self.api_url, False, response_time)
+                api_health_monitor.record_request(self.api_url, False, time.time() - request_start_time)
                 return None
-
-            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
-                retry_count += 1
-                if retry_count <= max_retries:
-                    wait_time = self._calculate_wait_time(retry_count)
-                    from src.privacy_utils import PrivacyMasker
-                    masked_keywords = PrivacyMasker.mask_keyword(keywords)
-                    self.logger.warning(f"API请求异常: {e.__class__.__name__}，将在{wait_time}秒后重试")
-                    masked_url = PrivacyMasker.mask_api_url(request_url)
-                    self.logger.warning(f"异常的API URL: {masked_url}")
-                    self.logger.warning(f"请求的关键词: {masked_keywords} (共{keyword_count}个)")
-                    time.sleep(wait_time)
-                    continue
-
-                from src.privacy_utils import PrivacyMasker
-                masked_keywords = PrivacyMasker.mask_keyword(keywords)
-                self.logger.error(f"API请求异常，重试次数超过上限: {e}")
-                masked_url = PrivacyMasker.mask_api_url(request_url)
-                self.logger.error(f"异常的API URL: {masked_url}")
-                self.logger.error(f"请求的关键词: {masked_keywords} (共{keyword_count}个)")
-                return None
-
-            except Exception as e:
-                from src.privacy_utils import PrivacyMasker
-                masked_keywords = PrivacyMasker.mask_keyword(keywords)
-                self.logger.error(f"API请求发生未预期的异常: {e}")
-                masked_url = PrivacyMasker.mask_api_url(request_url)
-                self.logger.error(f"异常的API URL: {masked_url}")
-                self.logger.error(f"请求的关键词: {masked_keywords} (共{keyword_count}个)")
-                return None
-
-        return None
-
-    def _should_retry(self, status_code: int) -> bool:
-        """判断是否应该重试请求
-
-        Args:
-            status_code: HTTP状态码
-
-        Returns:
-            布尔值，表示是否应该重试
-        """
-        return status_code in [429, 500, 502, 503, 504]
-
-    def _calculate_wait_time(self, retry_count: int) -> float:
-        """计算重试等待时间 - 性能优化：使用线性增长减少等待时间
-
-        Args:
-            retry_count: 当前重试次数
-
-        Returns:
-            等待时间（秒）
-        """
-        # 使用线性增长而非指数增长，减少总等待时间
-        # 第1次重试: 3秒, 第2次: 6秒, 第3次: 12秒
-        wait_times = [3, 6, 12]
-        if retry_count <= len(wait_times):
-            return wait_times[retry_count - 1]
-        else:
-            return 15  # 超过3次重试时固定15秒
-
-    def _check_circuit_breaker(self) -> bool:
-        """检查熔断器状态"""
-        if not self.is_circuit_open:
-            return False
-
-        # 检查是否应该尝试恢复
-        if time.time() - self.circuit_open_time > config.api_health_check_interval:
-            from src.privacy_utils import PrivacyMasker
-            masked_url = PrivacyMasker.mask_api_url(self.api_url)
-            self.logger.info(f"尝试恢复API连接: {masked_url}")
-            self.is_circuit_open = False
-            self.circuit_open_time = None
-            return False
-
-        return True
-
-    def _update_api_health(self, success: bool):
-        """更新API健康状态"""
-        if success:
-            self.consecutive_failures = 0
-            self.last_success_time = time.time()
-            if self.is_circuit_open:
-                from src.privacy_utils import PrivacyMasker
-                masked_url = PrivacyMasker.mask_api_url(self.api_url)
-                self.logger.info(f"API恢复正常: {masked_url}")
-                self.is_circuit_open = False
-                self.circuit_open_time = None
-        else:
-            self.consecutive_failures += 1
-            if self.consecutive_failures >= config.api_circuit_breaker_threshold:
-                if not self.is_circuit_open:
-                    from src.privacy_utils import PrivacyMasker
-                    masked_url = PrivacyMasker.mask_api_url(self.api_url)
-                    self.logger.warning(f"API熔断器开启: {masked_url} (连续失败{self.consecutive_failures}次)")
-                    self.is_circuit_open = True
-                    self.circuit_open_time = time.time()
-
-
+            finally:
+                # 流式响应需显式关闭，未读完的连接不会放回连接池
+                response.close()
 
     def close(self):
         """关闭会话"""
@@ -6,21 +6,29 @@
 支持智能队列调度和渐进式批次处理
 """
 
+import heapq
 import logging
+import statistics
 import time
-from typing import Dict, List, Any
+from typing import Callable, Deque, Dict, List, Any, Optional
 import concurrent.futures
-from collections import deque
+from collections import defaultdict, deque
 import queue
 import threading
 
+import requests
+
 from src.config import config
-from src.keyword_api import KeywordAPI
+from src.keyword_api import KeywordAPI, create_keyword_adapter, dedupe_keywords
 from src.api_health_monitor import api_health_monitor
 
 # 配置日志
 logger = logging.getLogger('content_watcher.keyword_api_multi')
 
+# 自适应批次大小：每个API保留的最近批次耗时样本数，及开始调整前所需的最少样本数
+LATENCY_WINDOW = 32
+LATENCY_MIN_SAMPLES = 5
+
 class APISchedulerConfig:
     """API调度器配置类 - 性能优化版本"""
 
@@ -121,7 +129,7 @@ class ThreadResourceManager:
             thread.start()
             self.threads.append(thread)
         
-        self.logger.debug(f"创建了 {len(self.threads)} 个工作线程")
+        self.logger.debug("创建了 %d 个工作线程", len(self.threads))
     
     def _worker_wrapper(self, target_func, args, worker_id):
         """工作线程包装器，添加异常处理和资源清理"""
@@ -130,7 +138,7 @@ class ThreadResourceManager:
         except Exception as e:
             self.logger.error(f"工作线程 {worker_id} 异常退出: {e}")
         finally:
-            self.logger.debug(f"工作线程 {worker_id} 正常结束")
+            self.logger.debug("工作线程 %d 正常结束", worker_id)
     
     def shutdown_gracefully(self):
         """优雅关闭所有工作线程"""
@@ -162,11 +170,21 @@ class MultiAPIKeywordManager:
         self.logger = logging.getLogger('content_watcher.keyword_api_multi')
         self._api_clients = {}  # 缓存API客户端实例
         self._api_clients_lock = threading.RLock()  # 线程安全锁
+        # 所有API客户端共享的适配器，连接池按host:port划分，同一主机的多个API地址共用连接
+        self._shared_adapter = create_keyword_adapter(pool_maxsize=64)
         
         # 使用配置对象而非硬编码
         self.config = scheduler_config or APISchedulerConfig()
         self._workers_initialized = False
         
+        # 按最近批次耗时的p95自适应调整批次大小（AIMD），上限为配置的批次大小
+        self._api_latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self._adaptive_batch_size = self.config.batch_size
+        self._batch_size_lock = threading.Lock()
+        
+        # 队列工作线程池，首次使用队列调度时创建，后续调用复用同一批线程
+        self._pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        
         # 初始化线程资源管理器
         self.thread_manager = ThreadResourceManager(
             max_workers=self.config.max_workers,
@@ -174,16 +192,19 @@ class MultiAPIKeywordManager:
         )
         
         # 记录实际使用的批处理大小
-        if self.logger.isEnabledFor(logging.DEBUG):
-            self.logger.debug(f"多API管理器初始化，批处理大小: {self.config.batch_size}")
+        self.logger.debug("多API管理器初始化，批处理大小: %d", self.config.batch_size)
 
     def _ensure_workers_initialized(self):
         """确保工作线程数已正确初始化"""
         if not self._workers_initialized:
             api_count = len(config.keywords_api_urls) if config.keywords_api_urls else 1
             self.max_queue_workers = max(1, min(self.config.max_workers, api_count))
+            self._pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_queue_workers,
+                thread_name_prefix='kw-api-worker'
+            )
             self._workers_initialized = True
-            self.logger.debug(f"初始化队列工作线程数: {self.max_queue_workers}")
+            self.logger.debug("初始化队列工作线程数: %d", self.max_queue_workers)
 
     def batch_query_keywords_parallel(self, keywords_list: List[str], max_retries: int = 2) -> Dict[str, Dict[str, Any]]:
         """并发查询关键词信息，使用多个API地址
@@ -211,8 +232,7 @@ class MultiAPIKeywordManager:
                     from src.privacy_utils import PrivacyMasker
                     masked_url = PrivacyMasker.mask_api_url(api_url)
                     self.logger.info(f"使用单API模式: {masked_url}")
-                    api = KeywordAPI(api_url)
-                    return api.batch_query_keywords(keywords_list, max_retries)
+                    return self._get_api_client(api_url).batch_query_keywords(keywords_list, max_retries)
                 else:
                     self.logger.error("没有配置任何关键词API地址，跳过关键词查询")
                     return {}
@@ -245,12 +265,8 @@ class MultiAPIKeywordManager:
 
     def _batch_query_direct_parallel(self, keywords_list: List[str], max_retries: int) -> Dict[str, Dict[str, Any]]:
         """直接并发查询（原有方法，适用于小批量）"""
-        # 关键词去重
-        unique_keywords = {}
-        for kw in keywords_list:
-            unique_keywords[kw.lower()] = kw
-        
-        unique_kw_list = list(unique_keywords.values())
+        # 关键词去重（大小写不敏感）
+        unique_kw_list = list(dedupe_keywords(keywords_list, str.casefold).values())
         
         # 根据API数量分片关键词
         num_apis = len(config.keywords_api_urls)
@@ -261,14 +277,8 @@ class MultiAPIKeywordManager:
 
     def _batch_query_with_queue_scheduler(self, keywords_list: List[str], max_retries: int) -> Dict[str, Dict[str, Any]]:
         """使用智能队列调度器处理大批量请求"""
-        # 关键词去重 - 使用统一规范化函数
-        from src.keyword_extractor import keyword_extractor
-        unique_keywords = {}
-        for kw in keywords_list:
-            normalized_kw = keyword_extractor.normalize_keyword(kw)
-            if normalized_kw:  # 只处理有效的关键词
-                unique_keywords[normalized_kw] = kw
-        unique_kw_list = list(unique_keywords.values())
+        # 关键词去重 - 使用统一规范化函数，只保留有效的关键词
+        unique_kw_list = list(dedupe_keywords(keywords_list).values())
         
         total_keywords = len(unique_kw_list)
         self.logger.info(f"启动智能队列调度器，处理 {total_keywords} 个关键词")
@@ -284,53 +294,64 @@ class MultiAPIKeywordManager:
         keyword_batches = self._create_keyword_batches(unique_kw_list)
         for batch in keyword_batches:
             task_queue.put(batch)
-        
-        # 创建队列处理工作线程
-        self._ensure_workers_initialized()
-        threads = []
-        for i in range(self.max_queue_workers):
-            thread = threading.Thread(
-                target=self._queue_worker,
-                args=(task_queue, results, results_lock, max_retries, i)
-            )
-            thread.start()
-            threads.append(thread)
-        
-        # 使用智能等待机制替代task_queue.join() - 解决队列阻塞问题
-        start_time = time.time()
-        max_wait_time = min(self.config.queue_timeout, 120)  # 最大等待120秒
-        check_interval = 0.5  # 检查间隔500ms，减少CPU占用
 
-        while not task_queue.empty():
-            elapsed_time = time.time() - start_time
-            if elapsed_time > max_wait_time:
-                remaining_tasks = task_queue.qsize()
-                self.logger.warning(f"队列处理超时({max_wait_time}秒)，剩余任务: {remaining_tasks}，强制结束")
-                break
+        # 确保队列工作线程池已创建（工作线程数在此确定）
+        self._ensure_workers_initialized()
 
-            # 检查工作线程状态
-            alive_threads = sum(1 for t in threads if t.is_alive())
-            if alive_threads == 0 and not task_queue.empty():
-                self.logger.warning("所有工作线程已结束但队列仍有任务，强制结束")
-                break
+        # 所有批次处理完毕，或所有工作任务均已结束时置位；主线程只需带超时等待该事件
+        finished = threading.Event()
+        pending_batches = len(keyword_batches)
+        running_workers = self.max_queue_workers
+        counter_lock = threading.Lock()
+        if pending_batches == 0:
+            finished.set()
+
+        def batch_done() -> None:
+            nonlocal pending_batches
+            with counter_lock:
+                pending_batches -= 1
+                if pending_batches == 0:
+                    finished.set()
+
+        def worker_done(_future: concurrent.futures.Future) -> None:
+            nonlocal running_workers
+            with counter_lock:
+                running_workers -= 1
+                if running_workers == 0:
+                    finished.set()
+
+        # 提交队列工作任务
+        stop_event = threading.Event()
+        futures = [
+            self._pool.submit(self._queue_worker, task_queue, results, results_lock, max_retries, i,
+                              stop_event, batch_done)
+            for i in range(self.max_queue_workers)
+        ]
+        for future in futures:
+            future.add_done_callback(worker_done)
 
-            time.sleep(check_interval)
+        max_wait_time = min(self.config.queue_timeout, 120)  # 最大等待120秒
+        if not finished.wait(timeout=max_wait_time):
+            remaining_tasks = task_queue.qsize()
+            self.logger.warning(f"队列处理超时({max_wait_time}秒)，剩余任务: {remaining_tasks}，强制结束")
+        elif pending_batches > 0:
+            self.logger.warning("所有工作线程已结束但队列仍有任务，强制结束")
 
-        # 优雅停止工作线程
+        # 通知工作线程停止领取新批次，并丢弃未领取的批次，保持队列计数一致
         self.logger.debug("发送停止信号给所有工作线程")
-        for _ in threads:
+        stop_event.set()
+        while True:
             try:
-                task_queue.put(None, timeout=1)  # 1秒超时避免阻塞
-            except queue.Full:
-                self.logger.warning("队列已满，无法发送停止信号")
+                task_queue.get_nowait()
+            except queue.Empty:
                 break
+            task_queue.task_done()
 
-        # 等待线程结束，设置合理超时
+        # 等待工作任务结束，设置合理超时；线程本身留在池中供下次调用复用
         thread_timeout = 15  # 减少到15秒
-        for i, thread in enumerate(threads):
-            thread.join(timeout=thread_timeout)
-            if thread.is_alive():
-                self.logger.warning(f"工作线程 {i} 未能在{thread_timeout}秒内正常结束，可能存在阻塞")
+        _, not_done = concurrent.futures.wait(futures, timeout=thread_timeout)
+        if not_done:
+            self.logger.warning(f"{len(not_done)} 个工作线程未能在{thread_timeout}秒内正常结束，可能存在阻塞")
 
         self.logger.info(f"队列调度完成，共处理 {len(results)} 个关键词")
         return results
@@ -338,20 +359,21 @@ class MultiAPIKeywordManager:
     def _create_keyword_batches(self, keywords: List[str]) -> List[List[str]]:
         """将关键词列表分割成批次"""
         batches = []
-        batch_size = self.config.batch_size
+        with self._batch_size_lock:
+            batch_size = self._adaptive_batch_size
         for i in range(0, len(keywords), batch_size):
             batch = keywords[i:i + batch_size]
             batches.append(batch)
         
         # 记录批次创建信息（仅调试级别）
-        if self.logger.isEnabledFor(logging.DEBUG):
-            self.logger.debug(f"创建 {len(batches)} 个批次，每批最多 {batch_size} 个关键词")
+        self.logger.debug("创建 %d 个批次，每批最多 %d 个关键词", len(batches), batch_size)
         
         return batches
 
     def _queue_worker(self, task_queue: queue.Queue, results: Dict, results_lock: threading.Lock, 
-                      max_retries: int, worker_id: int):
-        """队列工作线程"""
+                      max_retries: int, worker_id: int, stop_event: threading.Event,
+                      batch_done: Callable[[], None]):
+        """队列工作线程，stop_event置位后不再领取新批次，每处理完一个批次调用batch_done"""
         # 防护检查：确保API地址列表不为空
         if not config.keywords_api_urls:
             self.logger.error(f"工作线程 {worker_id} 启动失败：没有可用的API地址")
@@ -366,14 +388,12 @@ class MultiAPIKeywordManager:
         api_url = config.keywords_api_urls[api_index]
         api_client = self._get_api_client(api_url)
         
-        self.logger.debug(f"队列工作线程 {worker_id} 启动，使用API {api_index}")
+        self.logger.debug("队列工作线程 %d 启动，使用API %d", worker_id, api_index)
         
-        while True:
+        while not stop_event.is_set():
             try:
-                # 获取任务，超时1秒
+                # 获取任务，超时1秒后重新检查停止信号
                 batch = task_queue.get(timeout=1)
-                if batch is None:  # 停止信号
-                    break
                 
                 # 智能批次大小验证和调整
                 max_batch_size = self._get_adaptive_batch_size(api_url)
@@ -384,31 +404,41 @@ class MultiAPIKeywordManager:
                 # 处理批次
                 start_time = time.time()
                 try:
-                    batch_result = api_client.batch_query_keywords(batch, max_retries)
+                    # 熔断器开启（连续失败）的API不再等待请求失败，直接转交其他API；
+                    # 熔断恢复期过后is_api_available会放行一次试探请求
+                    if api_health_monitor.is_api_available(api_url):
+                        batch_result = api_client.batch_query_keywords(batch, max_retries)
+                    else:
+                        self.logger.warning(f"工作线程 {worker_id} 的API {api_index} 熔断中，"
+                                          f"转交其他API处理 {len(batch)} 个关键词")
+                        batch_result = self._handle_api_failure(batch, api_index, max_retries)
                     
                     # 更新结果
                     with results_lock:
-                        results.update(batch_result)
+                        results |= batch_result
                     
                     # 计算处理时间和需要的间隔 - 根据seokey API特性优化
                     process_time = time.time() - start_time
+                    self._record_batch_latency(api_url, process_time if batch_result else None)
                     # 确保至少2秒间隔，考虑seokey API的限制
                     base_interval = max(self.config.batch_interval, 2.0)
                     required_interval = max(base_interval, base_interval - process_time)
 
-                    self.logger.debug(f"工作线程 {worker_id} 完成批次 {len(batch)} 个关键词，"
-                                    f"耗时 {process_time:.2f}s，休息 {required_interval:.2f}s")
+                    self.logger.debug("工作线程 %d 完成批次 %d 个关键词，耗时 %.2fs，休息 %.2fs",
+                                      worker_id, len(batch), process_time, required_interval)
 
                     # 总是休眠以减少API压力，确保符合seokey API限制
-                    time.sleep(required_interval)
+                    stop_event.wait(required_interval)
                         
                 except Exception as e:
+                    self._record_batch_latency(api_url, None)
                     self.logger.error(f"工作线程 {worker_id} 处理批次失败: {e}")
                     # 记录失败的关键词，但不创建虚假数据
                     self.logger.warning(f"跳过 {len(batch)} 个查询失败的关键词")
                 
                 finally:
                     task_queue.task_done()
+                    batch_done()
                     
             except queue.Empty:
                 continue
@@ -416,36 +446,68 @@ class MultiAPIKeywordManager:
                 self.logger.error(f"队列工作线程 {worker_id} 异常: {e}")
                 break
         
-        self.logger.debug(f"队列工作线程 {worker_id} 结束")
+        self.logger.debug("队列工作线程 %d 结束", worker_id)
+
+    def _record_batch_latency(self, api_url: str, latency: Optional[float]) -> None:
+        """记录批次耗时，并按最近耗时的p95以AIMD方式调整后续批次大小
+
+        p95低于请求超时的一半时批次大小加1（不超过配置的批次大小），
+        批次失败或p95超过请求超时的80%时减半（不低于1），避免大批次超时。
+
+        Args:
+            api_url: API地址
+            latency: 批次耗时（秒），批次失败时为None
+        """
+        timeout = config.keyword_query_timeout
+        with self._batch_size_lock:
+            old_size = self._adaptive_batch_size
+            if latency is None:
+                self._adaptive_batch_size = max(1, old_size // 2)
+            else:
+                latencies = self._api_latencies[api_url]
+                latencies.append(latency)
+                if len(latencies) < LATENCY_MIN_SAMPLES:
+                    return
+                p95 = statistics.quantiles(latencies, n=20)[18]
+                if p95 > timeout * 0.8:
+                    self._adaptive_batch_size = max(1, old_size // 2)
+                elif p95 < timeout * 0.5:
+                    self._adaptive_batch_size = min(self.config.batch_size, old_size + 1)
+            new_size = self._adaptive_batch_size
+
+        if new_size != old_size:
+            self.logger.debug("自适应批次大小调整: %d -> %d", old_size, new_size)
 
     def _shard_keywords(self, keywords: List[str], num_apis: int) -> List[List[str]]:
-        """将关键词分片到不同API - 基于健康状态优化分配"""
+        """将关键词分片到不同API - 按健康状态加权分配
+
+        每个关键词分配给当前加权负载（已分配数/成功率）最小的可用API，
+        分配量与成功率成正比；没有可用API时退回轮询。
+        """
         keyword_shards = [[] for _ in range(num_apis)]
 
-        # 获取API健康状态，优先分配给健康的API
-        api_health_scores = []
+        # 可用API的权重为其成功率，不可用或成功率为0的API不参与分配
+        health_summary = api_health_monitor.get_health_summary()
+        weights = {}
         for i, api_url in enumerate(config.keywords_api_urls[:num_apis]):
             if api_health_monitor.is_api_available(api_url):
-                # 健康的API获得更高权重
-                health_summary = api_health_monitor.get_health_summary().get(api_url, {})
-                success_rate = health_summary.get('success_rate', 1.0)
-                api_health_scores.append((i, success_rate))
-            else:
-                api_health_scores.append((i, 0.0))  # 不健康的API权重为0
-
-        # 按健康分数排序
-        api_health_scores.sort(key=lambda x: x[1], reverse=True)
-
-        # 智能分配：优先分配给健康的API
-        for i, keyword in enumerate(keywords):
-            if api_health_scores:
-                # 选择最健康的可用API
-                best_api_index = api_health_scores[i % len(api_health_scores)][0]
-                keyword_shards[best_api_index].append(keyword)
-            else:
-                # 如果没有健康的API，使用轮询
-                api_index = i % num_apis
-                keyword_shards[api_index].append(keyword)
+                success_rate = health_summary.get(api_url, {}).get('success_rate', 1.0)
+                if success_rate > 0:
+                    weights[i] = success_rate
+
+        if not weights:
+            # 如果没有健康的API，使用轮询
+            for i, keyword in enumerate(keywords):
+                keyword_shards[i % num_apis].append(keyword)
+            return keyword_shards
+
+        # 小顶堆按(加权负载, API索引)排序，每次取负载最小的API
+        heap = [(0.0, api_index) for api_index in weights]
+        heapq.heapify(heap)
+        for keyword in keywords:
+            load, api_index = heap[0]
+            keyword_shards[api_index].append(keyword)
+            heapq.heapreplace(heap, (load + 1.0 / weights[api_index], api_index))
 
         return keyword_shards
 
@@ -453,10 +515,10 @@ class MultiAPIKeywordManager:
         """获取或创建API客户端实例（线程安全）"""
         with self._api_clients_lock:
             if api_url not in self._api_clients:
-                self._api_clients[api_url] = KeywordAPI(api_url)
+                self._api_clients[api_url] = KeywordAPI(api_url, adapter=self._shared_adapter)
                 from src.privacy_utils import PrivacyMasker
                 masked_url = PrivacyMasker.mask_api_url(api_url)
-                self.logger.debug(f"创建新的API客户端: {masked_url}")
+                self.logger.debug("创建新的API客户端: %s", masked_url)
             return self._api_clients[api_url]
 
     def _execute_parallel_queries(self, keyword_shards: List[List[str]], max_retries: int) -> Dict[str, Dict[str, Any]]:
@@ -484,8 +546,8 @@ class MultiAPIKeywordManager:
                 api_index, shard = future_to_api[future]
                 try:
                     result = future.result(timeout=120)  # 总超时2分钟
-                    final_results.update(result)
-                    self.logger.debug(f"API {api_index} 查询完成，返回 {len(result)} 个关键词数据")
+                    final_results |= result
+                    self.logger.debug("API %d 查询完成，返回 %d 个关键词数据", api_index, len(result))
                 except Exception as e:
                     self.logger.error(f"API {api_index} 查询失败: {e}")
                     # 不进行故障转移，让失败的关键词在下次运行时重新尝试
@@ -552,6 +614,12 @@ class MultiAPIKeywordManager:
         except Exception as e:
             self.logger.warning(f"关闭线程资源时出错: {e}")
         
+        # 关闭队列工作线程池，未开始的工作任务直接取消
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._workers_initialized = False
+        
         # 关闭API客户端连接
         with self._api_clients_lock:
             for api_url, client in self._api_clients.items():
@@ -560,7 +628,7 @@ class MultiAPIKeywordManager:
                         client.close()
                         from src.privacy_utils import PrivacyMasker
                         masked_url = PrivacyMasker.mask_api_url(api_url)
-                        self.logger.debug(f"关闭API客户端连接: {masked_url}")
+                        self.logger.debug("关闭API客户端连接: %s", masked_url)
                 except Exception as e:
                     from src.privacy_utils import PrivacyMasker
                     masked_url = PrivacyMasker.mask_api_url(api_url)
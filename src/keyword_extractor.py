@@ -5,35 +5,93 @@
 从URL中提取关键词
 """
 
+import functools
 import logging
 import re
-from typing import Callable, List, Dict, Any
+from typing import Callable, List, Dict, Any, Iterable, NamedTuple, Optional, Tuple
 from urllib.parse import urlparse
 from src.privacy_utils import PrivacyMasker
 
 # 配置日志
 logger = logging.getLogger('content_watcher.keyword_extractor')
 
+# 需要交给urlparse处理的字符：IPv6地址括号、路径参数分隔符以及urlparse会剔除的制表/换行符
+_URL_FALLBACK_RE = re.compile(r'[\[\];\t\r\n]')
+
+# 十六进制ID（如哈希值）的字符集合，用集合包含判断代替正则匹配
+_HEX_CHARS = frozenset('0123456789abcdef')
+
+# 关键词规范化时替换为空格的ASCII特殊字符（字母、数字、下划线、连字符、单引号以外的字符）
+_SPECIAL_CHARS_TABLE = str.maketrans({
+    char: ' ' for char in map(chr, range(128)) if not (char.isalnum() or char in "_-'")
+})
+
+# 只由这些停用词组成的关键词视为无效
+_STOP_WORDS = frozenset({'a', 'an', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'})
+
+# 关键词提取结果的最大缓存URL数
+EXTRACT_CACHE_SIZE = 65536
+
+
+class _URLParts(NamedTuple):
+    """URL中关键词提取所需的部分"""
+    netloc: str
+    path: str
+
+
+def _split_url(url: str):
+    """提取URL的域名和路径部分
+
+    常见的http(s)://形式URL只用str.find切分，不构造完整的ParseResult；
+    其他形式的URL交给urlparse处理，两种方式的netloc和path结果一致。
+
+    Args:
+        url: 待解析的URL
+
+    Returns:
+        带netloc和path属性的对象
+    """
+    if not url.startswith(('https://', 'http://')) or _URL_FALLBACK_RE.search(url):
+        return urlparse(url)
+
+    netloc_start = url.index('//') + 2
+    path_start = len(url)
+    for delimiter in '/?#':
+        pos = url.find(delimiter, netloc_start)
+        if 0 <= pos < path_start:
+            path_start = pos
+    netloc = url[netloc_start:path_start]
+    if not netloc.isascii():
+        # 非ASCII域名需要urlparse做NFKC校验
+        return urlparse(url)
+
+    path_end = len(url)
+    for delimiter in '?#':
+        pos = url.find(delimiter, path_start)
+        if 0 <= pos < path_end:
+            path_end = pos
+    return _URLParts(netloc, url[path_start:path_end])
+
 class URLFilter:
-    """URL过滤器，用于确定URL是否应被排除处理"""
-    
-    def __init__(self):
-        """初始化过滤器并注册所有过滤规则"""
-        # 过滤规则字典，包含名称和对应的过滤函数
-        # 每个过滤函数接收ParseResult对象，如果URL应被排除则返回True
-        self.filters: Dict[str, Callable] = {
-            # 域名过滤规则
-            "domain_games_suffix": self._filter_domain_games_suffix,
-            
-            # 路径过滤规则
-            "path_tag": self._filter_path_tag,
-            
-            # 网站地图过滤规则
-            "sitemap_xml_extension": self._filter_sitemap_xml_extension,
-            "sitemap_path_keyword": self._filter_sitemap_path_keyword,
-            "sitemap_filename_keyword": self._filter_sitemap_filename_keyword,
-        }
-    
+    """URL过滤器，用于确定URL是否应被排除处理
+
+    内置规则合并在一个判断函数中执行，路径和小写路径只计算一次；
+    通过register_filter注册的自定义规则在内置规则之后依次执行。
+    """
+
+    def __init__(self, on_change: Optional[Callable[[], None]] = None):
+        """初始化过滤器
+
+        Args:
+            on_change: 过滤规则变化后的回调，用于让依赖过滤结果的缓存失效
+        """
+        self._on_change = on_change
+        # 自定义过滤规则字典，包含名称和对应的过滤函数
+        # 每个过滤函数接收带netloc和path属性的URL对象，如果URL应被排除则返回True
+        self.filters: Dict[str, Callable] = {}
+        # 自定义规则的元组快照，注册时重建，避免每个URL都遍历字典视图
+        self._custom_filters: Tuple[Tuple[str, Callable], ...] = ()
+
     def should_exclude(self, parsed_url) -> bool:
         """检查URL是否应该被排除
         
@@ -43,91 +101,72 @@ class URLFilter:
         Returns:
             如果URL应该被排除，返回True；否则返回False
         """
-        # 遍历所有过滤规则
-        for filter_name, filter_func in self.filters.items():
-            try:
-                if filter_func(parsed_url):
-                    # 调试日志，记录匹配的过滤规则
-                    if logger.isEnabledFor(logging.DEBUG):
-                        domain = parsed_url.netloc
-                        logger.debug(f"URL被过滤规则'{filter_name}'排除: {domain}")
-                    return True
-            except Exception as e:
-                # 过滤规则执行出错，记录日志但不中断处理
-                logger.error(f"执行过滤规则'{filter_name}'时出错: {e}")
-        
-        # 所有过滤规则都通过，URL不应被排除
-        return False
-    
-    # ===== 域名过滤规则 =====
-    
-    def _filter_domain_games_suffix(self, parsed_url) -> bool:
-        """过滤.games后缀的域名
-        
-        Args:
-            parsed_url: 解析后的URL对象
-            
-        Returns:
-            如果域名以.games结尾，返回True；否则返回False
-        """
-        return parsed_url.netloc.endswith('.games')
-    
-    # ===== 路径过滤规则 =====
-    
-    def _filter_path_tag(self, parsed_url) -> bool:
-        """过滤包含/tag/的路径
-        
-        Args:
-            parsed_url: 解析后的URL对象
-            
-        Returns:
-            如果路径包含/tag/，返回True；否则返回False
-        """
-        return '/tag/' in parsed_url.path
-    
-    # ===== 网站地图过滤规则 =====
-    
-    def _filter_sitemap_xml_extension(self, parsed_url) -> bool:
-        """过滤XML格式的网站地图
-        
-        Args:
-            parsed_url: 解析后的URL对象
-            
-        Returns:
-            如果路径以.xml或.xml.gz结尾，返回True；否则返回False
-        """
-        path = parsed_url.path.lower()
-        return path.endswith('.xml') or path.endswith('.xml.gz')
-    
-    def _filter_sitemap_path_keyword(self, parsed_url) -> bool:
-        """过滤路径中包含sitemap关键词的URL
-        
+        filter_name = self._match_builtin_rules(parsed_url) or self._match_custom_filters(parsed_url)
+        if filter_name is None:
+            # 所有过滤规则都通过，URL不应被排除
+            return False
+
+        # 调试日志，记录匹配的过滤规则
+        logger.debug("URL被过滤规则'%s'排除: %s", filter_name, parsed_url.netloc)
+        return True
+
+    @staticmethod
+    def _match_builtin_rules(parsed_url) -> Optional[str]:
+        """依次检查内置过滤规则，内置规则对合法的解析结果不会抛出异常
+
         Args:
             parsed_url: 解析后的URL对象
-            
+
         Returns:
-            如果路径中含有sitemap关键词，返回True；否则返回False
+            命中的规则名称，未命中任何规则返回None
         """
-        path = parsed_url.path.lower()
-        return '/sitemap' in path or 'sitemap.' in path or '/sitemaps/' in path
-    
-    def _filter_sitemap_filename_keyword(self, parsed_url) -> bool:
-        """过滤文件名包含sitemap关键词的URL
-        
+        # 域名过滤规则：.games后缀的域名
+        if parsed_url.netloc.endswith('.games'):
+            return "domain_games_suffix"
+
+        # 路径过滤规则：包含/tag/的路径
+        path = parsed_url.path
+        if '/tag/' in path:
+            return "path_tag"
+
+        # 网站地图过滤规则
+        path_lower = path.lower()
+        # XML格式的网站地图：以.xml或.xml.gz结尾
+        if path_lower.endswith(('.xml', '.xml.gz')):
+            return "sitemap_xml_extension"
+        # 先整体扫描一次sitemap，绝大多数路径不含该词，可跳过后续各个子串检查
+        has_sitemap = 'sitemap' in path_lower
+        # 路径中含有sitemap关键词（/sitemaps/已被/sitemap覆盖）
+        if has_sitemap and ('/sitemap' in path_lower or 'sitemap.' in path_lower):
+            return "sitemap_path_keyword"
+        # 文件名含有sitemap关键词，或以sm-开头，或最后两段拼接后含有sitemap
+        path_parts = path.strip('/').rsplit('/', 2)
+        filename = path_parts[-1]
+        # 只在路径含有sitemap时才对整个文件名转小写，sm-前缀只需比较前三个字符
+        if ((has_sitemap and 'sitemap' in filename.lower()) or
+                filename[:3].lower() == 'sm-' or
+                (len(path_parts) > 1 and 'sitemap' in path_parts[-2] + path_parts[-1])):
+            return "sitemap_filename_keyword"
+
+        return None
+
+    def _match_custom_filters(self, parsed_url) -> Optional[str]:
+        """依次执行自定义过滤规则
+
         Args:
             parsed_url: 解析后的URL对象
-            
+
         Returns:
-            如果文件名包含sitemap关键词，返回True；否则返回False
+            命中的规则名称，未命中任何规则返回None
         """
-        path_parts = parsed_url.path.strip('/').split('/')
-        if not path_parts:
-            return False
-            
-        filename = path_parts[-1].lower()
-        return ('sitemap' in filename or 
-                filename.startswith('sm-') or 
-                (len(path_parts) > 1 and 'sitemap' in ''.join(path_parts[-2:])))
+        for filter_name, filter_func in self._custom_filters:
+            try:
+                if filter_func(parsed_url):
+                    return filter_name
+            except Exception as e:
+                # 过滤规则执行出错，记录日志但不中断处理
+                logger.error(f"执行过滤规则'{filter_name}'时出错: {e}")
+        return None
 
     # ===== 注册新的过滤规则 =====
     
@@ -136,12 +175,15 @@ class URLFilter:
         
         Args:
             name: 过滤规则名称
-            filter_func: 过滤函数，接收ParseResult对象，返回布尔值
+            filter_func: 过滤函数，接收带netloc和path属性的URL对象，返回布尔值
         """
         if name in self.filters:
             logger.warning(f"过滤规则'{name}'已存在，将被覆盖")
         
         self.filters[name] = filter_func
+        self._custom_filters = tuple(self.filters.items())
+        if self._on_change is not None:
+            self._on_change()
         logger.info(f"已注册新的过滤规则: {name}")
 
 
@@ -150,11 +192,43 @@ class KeywordExtractor:
 
     def __init__(self):
         """初始化提取器"""
-        # 创建URL过滤器
-        self.url_filter = URLFilter()
+        # 按原始URL缓存提取结果，同一URL会在多个sitemap和多次运行中重复出现
+        self._extract_cached = functools.lru_cache(maxsize=EXTRACT_CACHE_SIZE)(self._extract_keywords)
+        # 创建URL过滤器，注册新规则时自动清空提取缓存
+        self.url_filter = URLFilter(on_change=self.cache_clear)
 
     def extract_keywords_from_url(self, url: str) -> str:
-        """从URL中提取关键词
+        """从URL中提取关键词，结果按URL缓存
+
+        Args:
+            url: 待提取关键词的URL
+
+        Returns:
+            提取出的关键词字符串，如果无法提取则返回空字符串
+        """
+        return self._extract_cached(url)
+
+    def extract_keywords_batch(self, urls: Iterable[str]) -> List[str]:
+        """批量从URL中提取关键词，结果与逐个调用extract_keywords_from_url一致
+
+        Args:
+            urls: 待提取关键词的URL
+
+        Returns:
+            与输入顺序一致的关键词列表，无法提取的URL对应空字符串
+        """
+        return list(map(self._extract_cached, urls))
+
+    def cache_info(self):
+        """返回关键词提取缓存的命中统计，用于调整缓存大小"""
+        return self._extract_cached.cache_info()
+
+    def cache_clear(self) -> None:
+        """清空关键词提取缓存，url_filter注册新的过滤规则时会自动调用"""
+        self._extract_cached.cache_clear()
+
+    def _extract_keywords(self, url: str) -> str:
+        """从URL中提取关键词（不经过缓存）
 
         Args:
             url: 待提取关键词的URL
@@ -164,17 +238,20 @@ class KeywordExtractor:
         """
         try:
             # 解析URL获取路径
-            parsed_url = urlparse(url)
-            path_parts = parsed_url.path.strip('/').split('/')
+            parsed_url = _split_url(url)
+            path = parsed_url.path.strip('/')
             
             # 预处理：检查URL是否应该被排除
             if self.url_filter.should_exclude(parsed_url):
                 return ""
 
             # 如果路径为空则返回空字符串
-            if not path_parts:
+            if not path:
                 return ""
 
+            # 只拆出最后两段（最多3个元素），不拆分整个路径
+            path_parts = path.rsplit('/', 2)
+
             # 1. 检查是否为纯数字路径（如 /sitemap/games/33）
             if path_parts[-1].isdigit():
                 # 路径以纯数字结尾，跳过关键词提取
@@ -185,12 +262,13 @@ class KeywordExtractor:
                 # 路径以.games结尾，跳过关键词提取
                 return ""
 
-            # 2.a 新规则: 匹配 /game/[id]/[name].html 格式
-            if len(path_parts) >= 3 and path_parts[0] == "game" and path_parts[1].isdigit():
+            # 2.a 新规则: 匹配 /game/[id]/[name].html 格式，只在路径以game/开头时拆分前三段
+            game_parts = path.split('/', 3) if path.startswith('game/') else ()
+            if len(game_parts) >= 3 and game_parts[1].isdigit():
                 # 移除文件扩展名
-                base_name = path_parts[2]
+                base_name = game_parts[2]
                 if "." in base_name:
-                    base_name = base_name.split('.')[0]  # 移除扩展名
+                    base_name = base_name.partition('.')[0]  # 移除扩展名
                 keywords = base_name.replace('-', ' ')
                 # logger.debug(f"从带ID的游戏URL提取关键词: {keywords}")
                 return keywords
@@ -205,7 +283,8 @@ class KeywordExtractor:
             # 3. 其他情况：一般页面提取最后一部分作为关键词
             # 如果最后部分看起来像是 ID 或太短（少于3个字符），则尝试使用前一部分
             last_part = path_parts[-1]
-            if len(last_part) < 3 or last_part.isdigit() or re.match(r'^[a-f0-9]+$', last_part):
+            # 长度检查在前，保证十六进制判断时last_part非空
+            if len(last_part) < 3 or last_part.isdigit() or _HEX_CHARS.issuperset(last_part):
                 # 如果路径只有一部分则返回空字符串
                 if len(path_parts) < 2:
                     return ""
@@ -214,7 +293,7 @@ class KeywordExtractor:
             
             # 移除文件扩展名
             if "." in last_part:
-                last_part = last_part.split('.')[0]  # 移除扩展名
+                last_part = last_part.partition('.')[0]  # 移除扩展名
 
             # 将连字符和下划线替换为空格，并清理多余空格
             keywords = last_part.replace('-', ' ').replace('_', ' ')
@@ -274,28 +353,23 @@ class KeywordExtractor:
         if not keyword or not isinstance(keyword, str):
             return ""
 
-        # 基本清理
-        normalized = keyword.strip().lower()
+        # 基本清理：转小写并按空白拆分，同时去除首尾空格、多余的空格和换行符
+        words = keyword.lower().split()
 
         # 检查是否为空或只有空格
-        if not normalized or normalized.isspace():
+        if not words:
             return ""
 
-        # 移除多余的空格和换行符
-        normalized = ' '.join(normalized.split())
+        normalized = ' '.join(words)
 
         # 检查是否包含非英文字符（seokey API主要支持英文）
-        import re
-        if re.search(r'[^\x00-\x7F]', normalized):
+        if not normalized.isascii():
             # 包含非ASCII字符，可能不被API支持
             return ""
 
-        # 移除特殊字符，但保留一些游戏常用的字符
+        # 移除特殊字符，但保留一些游戏常用的字符，并再次清理多余空格
         # 保留：字母、数字、空格、连字符、单引号（如papa's）
-        normalized = re.sub(r'[^\w\s\-\']', ' ', normalized)
-
-        # 再次清理多余空格
-        normalized = ' '.join(normalized.split())
+        normalized = ' '.join(normalized.translate(_SPECIAL_CHARS_TABLE).split())
 
         # 检查长度限制
         if len(normalized) < 2:  # 太短的关键词可能无意义
@@ -304,11 +378,7 @@ class KeywordExtractor:
             normalized = normalized[:80].strip()
 
         # 检查是否只包含停用词
-        stop_words = {'a', 'an', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-        words = normalized.split()
-        meaningful_words = [w for w in words if w not in stop_words]
-
-        if not meaningful_words:  # 只包含停用词
+        if _STOP_WORDS.issuperset(normalized.split()):
             return ""
 
         return normalized
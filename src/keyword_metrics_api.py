@@ -11,14 +11,36 @@ from __future__ import annotations
 import gzip
 import json
 import logging
-from typing import Any, Dict, List, Callable, Tuple
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Callable, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from src.config import config
+from src.privacy_utils import PrivacyMasker
+from src.thread_safe_manager import TokenBucket
 
 logger = logging.getLogger("content_watcher.keyword_metrics_api")
 
+# Retry-After 最长遵循时间（秒），避免异常响应头导致长时间阻塞
+MAX_RETRY_AFTER = 60.0
+
+# gzip压缩级别：JSON在低级别下已能获得大部分压缩收益，CPU开销远低于级别9
+GZIP_COMPRESS_LEVEL = 3
+# 请求体不超过该字节数时不压缩，小数据压缩收益有限
+GZIP_MIN_BYTES = 2048
+
+
+def _first_present(data: Dict[str, Any], primary: str, fallback: str, default: Any) -> Any:
+    """按顺序取第一个不为None的字段值，两个字段都缺失时返回默认值"""
+    value = data.get(primary)
+    if value is None:
+        value = data.get(fallback)
+    return default if value is None else value
+
 
 class KeywordMetricsAPI:
     """负责提交关键词指标批量数据"""
@@ -29,6 +51,24 @@ class KeywordMetricsAPI:
         self.enabled: bool = config.metrics_api_enabled
         self.max_batch_size: int = config.metrics_api_max_batch_size  # 使用配置值而非硬编码
         self.use_gzip: bool = True
+        # 复用同一会话，多个批次共享TCP/TLS连接，避免每批重新握手
+        self.session: requests.Session = requests.Session()
+        # 每次请求都相同的头部设置在会话上，请求时只附加变化的头部
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "X-API-Key": self.api_key,
+            "Accept-Encoding": "gzip",
+        })
+        # 只访问单一主机：连接池大小与并发批次数一致，重试由_execute_with_retry负责
+        max_concurrent = max(1, config.metrics_api_max_concurrent)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrent, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # 多个站点并发提交时共享的在途请求许可，保证同时进行的请求数不超过连接池大小，
+        # 避免连接池溢出后丢弃连接、重新握手
+        self._request_slots = threading.BoundedSemaphore(max_concurrent)
+        # 令牌桶限流：允许与并发数相同的突发，之后按配置的QPS发放
+        self.rate_limiter = TokenBucket(rate=config.metrics_api_qps, capacity=config.metrics_api_max_concurrent)
 
         if self.enabled:
             logger.info("KeywordMetricsAPI 初始化完成，已启用")
@@ -37,11 +77,11 @@ class KeywordMetricsAPI:
 
     # ---------- 静态工具 ----------
     @staticmethod
-    def _compress_json_data(data: Any) -> bytes:
-        """gzip 压缩 JSON，可接受 list/dict
+    def _compress_json_data(json_bytes: bytes) -> bytes:
+        """gzip 压缩已序列化的 JSON 字节
 
         Args:
-            data: 要压缩的数据
+            json_bytes: 要压缩的JSON字节
 
         Returns:
             压缩后的字节数据
@@ -50,8 +90,7 @@ class KeywordMetricsAPI:
             Exception: 压缩失败时抛出异常
         """
         try:
-            json_bytes = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
-            compressed_data = gzip.compress(json_bytes, compresslevel=9)
+            compressed_data = gzip.compress(json_bytes, compresslevel=GZIP_COMPRESS_LEVEL)
 
             # 验证压缩效果
             if len(compressed_data) >= len(json_bytes):
@@ -62,7 +101,7 @@ class KeywordMetricsAPI:
 
             # 在调试模式下验证数据完整性
             if logger.isEnabledFor(logging.DEBUG):
-                if not KeywordMetricsAPI._verify_compression_integrity(data, compressed_data):
+                if not KeywordMetricsAPI._verify_compression_integrity(json_bytes, compressed_data):
                     raise ValueError("压缩数据完整性验证失败")
                 logger.debug("压缩数据完整性验证通过")
 
@@ -73,27 +112,18 @@ class KeywordMetricsAPI:
             raise
 
     @staticmethod
-    def _verify_compression_integrity(original_data: Any, compressed_data: bytes) -> bool:
+    def _verify_compression_integrity(original_bytes: bytes, compressed_data: bytes) -> bool:
         """验证压缩数据的完整性
 
         Args:
-            original_data: 原始数据
+            original_bytes: 压缩前的JSON字节
             compressed_data: 压缩后的数据
 
         Returns:
             bool: 数据完整性验证结果
         """
         try:
-            # 解压数据
-            decompressed_bytes = gzip.decompress(compressed_data)
-            decompressed_json = decompressed_bytes.decode('utf-8')
-            decompressed_data = json.loads(decompressed_json)
-
-            # 比较数据
-            original_json = json.dumps(original_data, ensure_ascii=False, separators=(",", ":"))
-            reconstructed_json = json.dumps(decompressed_data, ensure_ascii=False, separators=(",", ":"))
-
-            is_valid = original_json == reconstructed_json
+            is_valid = gzip.decompress(compressed_data) == original_bytes
             if not is_valid:
                 logger.error("压缩数据完整性验证失败：解压后数据与原始数据不匹配")
 
@@ -111,39 +141,60 @@ class KeywordMetricsAPI:
             return True, "success"
         if status in {429, 500, 502, 503, 504}:
             logger.warning(f"服务器暂不可用({status})，建议重试")
-            from src.privacy_utils import PrivacyMasker
             masked_url = PrivacyMasker.mask_api_url(str(resp.url))
             logger.warning(f"失败的API URL: {masked_url}")
             return False, "retry"
         logger.error(f"请求失败({status})，不重试")
-        from src.privacy_utils import PrivacyMasker
         masked_url = PrivacyMasker.mask_api_url(str(resp.url))
         logger.error(f"失败的API URL: {masked_url}")
         return False, "fail"
 
     @staticmethod
-    def _execute_with_retry(request_func: Callable[[int], requests.Response], max_retries: int = 2) -> bool:
+    def _parse_retry_after(resp: requests.Response) -> Optional[float]:
+        """解析 Retry-After 响应头（秒数或HTTP日期），无效时返回None"""
+        value = resp.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, min(float(value), MAX_RETRY_AFTER))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            delay = retry_at.timestamp() - time.time()
+            return max(0.0, min(delay, MAX_RETRY_AFTER))
+        except (TypeError, ValueError):
+            return None
+
+    def _execute_with_retry(self, request_func: Callable[[int], requests.Response], max_retries: int = 2) -> bool:
         for retry in range(max_retries + 1):
             try:
-                resp = request_func(retry)
+                # 按令牌桶限流，仅在超出速率时等待
+                self.rate_limiter.consume()
+                # 只在请求期间占用许可，重试等待时不占用
+                with self._request_slots:
+                    resp = request_func(retry)
                 ok, reason = KeywordMetricsAPI._handle_response(resp)
                 if ok:
                     return True
-                if reason != "retry":
+                if reason != "retry" or retry >= max_retries:
                     return False
+                # 服务端给出 Retry-After 时遵循其要求，并让其他并发批次一同退避
+                retry_after = self._parse_retry_after(resp)
+                if retry_after is not None:
+                    logger.warning(f"服务器要求 {retry_after:.1f}s 后重试 {retry+1}/{max_retries}")
+                    self.rate_limiter.pause(retry_after)
+                    time.sleep(retry_after)
             except requests.exceptions.RequestException as e:
                 if retry >= max_retries:
                     logger.error(f"请求异常且超出重试次数: {e}")
-                    from src.privacy_utils import PrivacyMasker
                     masked_url = PrivacyMasker.mask_api_url(config.metrics_batch_api_url)
                     logger.error(f"异常的API URL: {masked_url}")
                     return False
                 wait = 2 ** retry
                 logger.warning(f"请求异常({e})，{wait}s 后重试 {retry+1}/{max_retries}")
-                from src.privacy_utils import PrivacyMasker
                 masked_url = PrivacyMasker.mask_api_url(config.metrics_batch_api_url)
                 logger.warning(f"异常的API URL: {masked_url}")
-                import time
                 time.sleep(wait)
         return False
 
@@ -170,7 +221,6 @@ class KeywordMetricsAPI:
         required_fields = ['avg_monthly_searches', 'competition', 'competition_index']
         for field in required_fields:
             if field not in metrics:
-                from src.privacy_utils import PrivacyMasker
                 masked_keyword = PrivacyMasker.mask_keyword(keyword)
                 raise ValueError(f"关键词数据缺少必要字段 '{field}'，无法为关键词 '{masked_keyword}' 创建更新数据")
 
@@ -179,7 +229,6 @@ class KeywordMetricsAPI:
 
         # 确保 monthly_searches 字段存在（但不创建虚假数据）
         if not metrics.get("monthly_searches"):
-            from src.privacy_utils import PrivacyMasker
             masked_keyword = PrivacyMasker.mask_keyword(keyword)
             logger.warning(f"关键词 '{masked_keyword}' 缺少月度搜索数据")
             # 如果没有月度数据，使用空数组而不是创建虚假数据
@@ -203,11 +252,20 @@ class KeywordMetricsAPI:
             logger.warning(f"items 数量({len(items)}) 超过限制({self.max_batch_size})，将被截断")
             items = items[: self.max_batch_size]
 
-        headers = {
-            "Content-Type": "application/json",
-            "X-API-Key": self.api_key,
-            "Accept-Encoding": "gzip",
-        }
+        # 请求体只序列化、压缩一次，重试时复用
+        # 注意：会话头部保持Content-Type为application/json，因为压缩的是JSON数据
+        body = json.dumps(items, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        headers = None
+        if self.use_gzip and len(body) > GZIP_MIN_BYTES:
+            try:
+                body = self._compress_json_data(body)
+                headers = {"Content-Encoding": "gzip"}
+                logger.debug(f"使用gzip压缩发送数据，压缩后大小: {len(body)} 字节")
+            except Exception as e:
+                # 压缩失败时降级到非压缩模式
+                logger.warning(f"gzip压缩失败，降级到非压缩模式: {e}")
+        if headers is None:
+            logger.debug(f"使用非压缩模式发送数据，大小: {len(body)} 字节")
 
         def do_request(retry_cnt: int) -> requests.Response:
             if retry_cnt == 0:
@@ -215,28 +273,16 @@ class KeywordMetricsAPI:
             else:
                 logger.info(f"重试提交({retry_cnt}) 共 {len(items)} 条")
 
-            # 尝试使用gzip压缩发送
-            if self.use_gzip:
-                try:
-                    headers_local = dict(headers)
-                    headers_local["Content-Encoding"] = "gzip"
-                    # 注意：保持Content-Type为application/json，因为压缩的是JSON数据
-                    data = self._compress_json_data(items)
-
-                    logger.debug(f"使用gzip压缩发送数据，压缩后大小: {len(data)} 字节")
-                    return requests.post(self.batch_api_url, headers=headers_local, data=data, timeout=80)
-
-                except Exception as e:
-                    logger.warning(f"gzip压缩失败，降级到非压缩模式: {e}")
-                    # 压缩失败时降级到非压缩模式
-                    return requests.post(self.batch_api_url, headers=headers, json=items, timeout=80)
-
-            # 非压缩模式
-            logger.debug(f"使用非压缩模式发送数据")
-            return requests.post(self.batch_api_url, headers=headers, json=items, timeout=80)
+            return self.session.post(self.batch_api_url, headers=headers, data=body, timeout=80)
 
         return self._execute_with_retry(do_request, max_retries)
 
+    def close(self) -> None:
+        """关闭会话，释放连接池"""
+        if self.session is not None:
+            self.session.close()
+            logger.debug("关闭关键词指标API会话")
+
     def _convert_monthly_searches_format(self, metrics: Dict[str, Any]) -> Dict[str, Any]:
         """转换新JSON格式的中文字段为sitemap API期望的英文字段和字符串类型
 
@@ -249,39 +295,17 @@ class KeywordMetricsAPI:
         if not metrics.get("monthly_searches"):
             return metrics
 
-        converted_monthly_searches = []
-        for month_data in metrics["monthly_searches"]:
-            if not isinstance(month_data, dict):
-                continue
-
-            converted_item = {}
-
-            # 转换年份字段：年 -> year，保持原始类型（数字或字符串），提供默认值
-            year_value = None
-            if "年" in month_data and month_data["年"] is not None:
-                year_value = month_data["年"]  # 保持原始类型
-            elif "year" in month_data and month_data["year"] is not None:
-                year_value = month_data["year"]  # 保持原始类型
-            else:
-                year_value = 2024  # 默认年份（数字类型，与上游API一致）
-
-            # 转换月份字段：月 -> month，保持原始类型（数字或字符串），提供默认值
-            month_value = None
-            if "月" in month_data and month_data["月"] is not None:
-                month_value = month_data["月"]  # 保持原始类型
-            elif "month" in month_data and month_data["month"] is not None:
-                month_value = month_data["month"]  # 保持原始类型
-            else:
-                month_value = 1  # 默认月份（数字类型，与上游API一致）
-
-            # 构建转换后的数据项
-            converted_item = {
-                "year": year_value,
-                "month": month_value,
+        # 年 -> year、月 -> month，保持原始类型（数字或字符串）；
+        # 缺失时使用默认值（数字类型，与上游API一致），非字典项直接跳过
+        converted_monthly_searches = [
+            {
+                "year": _first_present(month_data, "年", "year", 2024),
+                "month": _first_present(month_data, "月", "month", 1),
                 "searches": month_data.get("searches", 0)  # 提供默认搜索量
             }
-
-            converted_monthly_searches.append(converted_item)
+            for month_data in metrics["monthly_searches"]
+            if isinstance(month_data, dict)
+        ]
 
         # 只在有转换时才拷贝数据，优化性能
         if converted_monthly_searches:
@@ -7,7 +7,6 @@
 
 import time
 import logging
-import requests
 import queue
 import threading
 from typing import Dict, List, Any, Optional
@@ -46,27 +45,12 @@ class OptimizedSerialProcessor:
     def _init_api_client(self):
         """初始化优化的API客户端"""
         if self.api_urls:
+            # 串行处理只使用第一个API地址，其余地址不参与查询；
+            # KeywordAPI的会话已挂载按并发数配置的连接池和重试适配器，直接复用即可
             self.api_client = KeywordAPI(
-                api_urls=self.api_urls,
-                timeout=getattr(config, 'keyword_query_timeout', 80),
-                max_retries=getattr(config, 'api_retry_max', 2)
+                api_url=self.api_urls[0],
+                timeout=getattr(config, 'keyword_query_timeout', 80)
             )
-            
-            # 启用连接池优化
-            if hasattr(self.api_client, 'session'):
-                self.api_client.session.headers.update({
-                    'Connection': 'keep-alive',
-                    'Keep-Alive': 'timeout=30, max=100'
-                })
-                
-                # 配置连接池
-                adapter = requests.adapters.HTTPAdapter(
-                    pool_connections=1,
-                    pool_maxsize=10,
-                    max_retries=0  # 我们自己处理重试
-                )
-                self.api_client.session.mount('http://', adapter)
-                self.api_client.session.mount('https://', adapter)
     
     def process_keywords_optimized(self, keywords: List[str]) -> Dict[str, Any]:
         """优化的串行关键词处理"""
@@ -90,7 +74,7 @@ class OptimizedSerialProcessor:
             # 处理单个批次
             batch_result = self._process_single_batch_optimized(batch)
             if batch_result:
-                results.update(batch_result)
+                results |= batch_result
             
             batch_time = time.time() - batch_start
             success_count = len(batch_result) if batch_result else 0
@@ -160,25 +144,14 @@ class OptimizedSerialProcessor:
         
         try:
             # 使用优化的API客户端处理批次
+            # API健康状态由客户端在每次请求时记录到健康监控器
             batch_result = self.api_client.batch_query_keywords(batch, max_retries=2)
             
-            # 更新API健康状态
-            if self.api_urls:
-                api_url = self.api_urls[0]
-                if batch_result:
-                    api_health_monitor.record_success(api_url)
-                else:
-                    api_health_monitor.record_failure(api_url, "batch_processing_failed")
-            
             return batch_result if batch_result else {}
             
         except Exception as e:
             self.logger.error(f"批次处理异常: {e}")
             
-            # 记录API失败
-            if self.api_urls:
-                api_health_monitor.record_failure(self.api_urls[0], str(e))
-            
             return {}
     
     def _calculate_optimal_wait_time(self, batch_time: float) -> float:
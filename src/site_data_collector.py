@@ -5,10 +5,9 @@
 专门负责站点数据收集的单一职责
 """
 
-import base64
-import json
+import datetime
 import logging
-from typing import Tuple, Dict, List, Set
+from typing import Any, Tuple, Dict, List, Set, Optional
 
 from src.data_manager import data_manager
 from src.encryption import encryptor
@@ -50,14 +49,17 @@ class SiteDataCollector:
             return site_id, {}
 
         # 解密上一次的数据用于对比
-        previous_urls, previous_keywords_data = data_manager.get_previous_urls(site_id)
+        previous_urls, previous_keywords_data, stored_items = data_manager.get_previous_records(site_id)
 
-        # 查找今天更新的URL
-        updated_urls, new_encrypted_data, stats = self._find_updated_urls(
-            sitemap_data, previous_urls, previous_keywords_data
+        # 单次遍历sitemap：查找今天更新的URL，同时提取关键词并过滤URL
+        (updated_urls, url_keywords_map, keywords_set, new_encrypted_data,
+         url_index, previous_records, stats) = self._find_updated_urls(
+            sitemap_data, previous_urls, previous_keywords_data, stored_items
         )
 
-        if not updated_urls:
+        # 记录统计信息
+        new_url_count, updated_url_count = stats
+        if not new_url_count and not updated_url_count:
             logger.info(f"网站 {site_id} 没有发现更新")
             # 没有更新时，不进行保存操作，让site_update_processor处理
             return site_id, {
@@ -65,99 +67,137 @@ class SiteDataCollector:
                 'new_encrypted_data': new_encrypted_data
             }
 
-        # 提取关键词并过滤URL
-        url_keywords_map, valid_urls, keywords_set = self._extract_and_filter_keywords(updated_urls)
-        updated_urls = valid_urls
         logger.info(f"网站 {site_id} 过滤后的有效URL数量: {len(updated_urls)}")
-
-        # 记录统计信息
-        new_url_count, updated_url_count = stats
         logger.info(f"网站 {site_id} 统计: 新URL数量: {new_url_count}, 更新URL数量: {updated_url_count}, 总计: {len(updated_urls)}")
 
         # 返回收集的数据
         return site_id, {
             'updated_urls': updated_urls,
             'url_keywords_map': url_keywords_map,
-            'keywords': list(keywords_set),
-            'new_encrypted_data': new_encrypted_data
+            'keywords': frozenset(keywords_set),
+            'new_encrypted_data': new_encrypted_data,
+            'url_index': url_index,
+            'previous_records': previous_records
         }
 
-    def _find_updated_urls(self, sitemap_data: Dict, previous_urls: Dict, 
-                          previous_keywords_data: Dict) -> Tuple[List[str], List[Dict], Tuple[int, int]]:
-        """查找更新的URL"""
+    def _find_updated_urls(self, sitemap_data: Dict, previous_urls: Dict,
+                          previous_keywords_data: Dict,
+                          stored_items: Optional[Dict[str, Dict]] = None) -> Tuple[List[str], Dict[str, str], Set[str],
+                                                                 List[Dict], Dict[str, Dict],
+                                                                 Dict[str, Tuple[Dict, Any]], Tuple[int, int]]:
+        """查找更新的URL，并在同一次遍历中提取关键词、过滤无效URL
+
+        未变化的URL优先原样复用stored_items中已存储的URL密文和关键词密文，避免重复序列化和加密
+
+        Returns:
+            有效的更新URL列表、URL到关键词的映射、关键词集合、保留的加密数据、
+            明文URL到保留数据项的索引（供更新阶段免解密查找）、
+            更新URL到(上次存储的数据项, 上次的关键词数据)的映射、(新URL数, 更新URL数)
+        """
         updated_urls = []
-        new_encrypted_data = []
-        new_url_count = 0
-        updated_url_count = 0
-
-        for url, lastmod in sitemap_data.items():
-            # 检查URL是否为新URL或今天更新的URL
-            is_new = url not in previous_urls
-
-            # 对于已存在的URL，检查lastmod是否更新
-            is_updated = False
-            if not is_new and lastmod:
-                prev_lastmod = previous_urls.get(url)
-                if prev_lastmod != lastmod and sitemap_parser.is_updated_today(lastmod):
-                    is_updated = True
-
-            # 添加新URL或更新的URL
-            if is_new or is_updated:
-                if is_new:
-                    new_url_count += 1
-                else:
-                    updated_url_count += 1
-                updated_urls.append(url)
-
-            # 只为已存在且有关键词数据的URL创建加密数据
-            # 新URL和更新URL的数据将在关键词验证成功后再创建
-            if not is_new and not is_updated and url in previous_keywords_data:
-                # 这是一个已存在且有关键词数据的URL，保留它
-                encrypted_url = encryptor.encrypt_url(url)
-                url_data = {
-                    'encrypted_url': encrypted_url,
-                    'lastmod': lastmod
-                }
-
-                # 加密关键词数据
-                keywords_json = json.dumps(previous_keywords_data[url])
-                encrypted_keywords = encryptor.encrypt_data(keywords_json.encode('utf-8'))
-                url_data['keywords_data'] = base64.b64encode(encrypted_keywords).decode('utf-8')
-
-                new_encrypted_data.append(url_data)
-            elif not is_new and not is_updated:
-                # 这是一个已存在但没有关键词数据的URL，也保留基本信息
-                encrypted_url = encryptor.encrypt_url(url)
-                url_data = {
-                    'encrypted_url': encrypted_url,
-                    'lastmod': lastmod
-                }
-                new_encrypted_data.append(url_data)
-
-        return updated_urls, new_encrypted_data, (new_url_count, updated_url_count)
-
-    def _extract_and_filter_keywords(self, updated_urls: List[str]) -> Tuple[Dict[str, str], List[str], Set[str]]:
-        """提取关键词并过滤URL"""
         url_keywords_map = {}
-        valid_urls = []
         keywords_set = set()
-
-        for url in updated_urls:
-            keyword_raw = keyword_extractor.extract_keywords_from_url(url)
-            if not keyword_raw:
-                continue
-
-            # 使用统一的关键词规范化函数
-            keyword = keyword_extractor.normalize_keyword(keyword_raw)
-
-            # 跳过无效关键词
-            if not keyword:
-                continue
-
-            url_keywords_map[url] = keyword
-            valid_urls.append(url)
-            keywords_set.add(keyword)
-
-        return url_keywords_map, valid_urls, keywords_set
-
-
+        new_encrypted_data = []
+        url_index = {}  # 明文URL -> new_encrypted_data中的数据项，顺序与列表一致
+        previous_records = {}  # 更新URL -> (上次存储的数据项, 上次的关键词数据)
+        stored_items = stored_items or {}
+
+        # 预先用集合运算区分新URL与已存在URL，只对已存在且lastmod变化的URL做日期判断
+        current_keys = sitemap_data.keys()
+        previous_keys = previous_urls.keys()
+        new_urls = current_keys - previous_keys
+        today = datetime.date.today().isoformat()
+        is_updated_today = sitemap_parser.is_updated_today
+        changed_urls = {
+            url for url in current_keys & previous_keys
+            if sitemap_data[url] and previous_urls[url] != sitemap_data[url]
+            and is_updated_today(sitemap_data[url], today)
+        }
+        new_url_count = len(new_urls)
+        updated_url_count = len(changed_urls)
+        # 新URL和更新URL的关键词一次性批量提取
+        pending_urls = list(new_urls | changed_urls)
+        pending_keywords = dict(zip(pending_urls, self._extract_keywords(pending_urls)))
+
+        # 需要重新加密的记录复用一个加密会话
+        with encryptor.session() as cipher:
+            for url, lastmod in sitemap_data.items():
+                is_new = url in new_urls
+                is_updated = not is_new and url in changed_urls
+
+                # 新URL或更新的URL：立即提取关键词，跳过无法提取有效关键词的URL
+                if is_new or is_updated:
+                    keyword = pending_keywords[url]
+                    if keyword:
+                        url_keywords_map[url] = keyword
+                        updated_urls.append(url)
+                        keywords_set.add(keyword)
+                        # 记录更新URL上次存储的数据，关键词结果未变化时更新阶段可复用原密文
+                        if is_updated and url in stored_items:
+                            previous_records[url] = (stored_items[url], previous_keywords_data.get(url))
+
+                # 只为已存在且有关键词数据的URL创建加密数据
+                # 新URL和更新URL的数据将在关键词验证成功后再创建
+                elif url in previous_keywords_data:
+                    # 这是一个已存在且有关键词数据的URL，保留它
+                    stored_item = stored_items.get(url)
+                    if stored_item is not None and 'keywords_data' in stored_item:
+                        # 关键词数据未变化且已成功解密过，直接复用已存储的密文
+                        url_data = {
+                            'encrypted_url': stored_item['encrypted_url'],
+                            'lastmod': lastmod,
+                            'keywords_data': stored_item['keywords_data']
+                        }
+                    else:
+                        url_data = {
+                            'encrypted_url': cipher.encrypt_url(url),
+                            'lastmod': lastmod,
+                            'keywords_data': cipher.encrypt_json(previous_keywords_data[url])
+                        }
+
+                    new_encrypted_data.append(url_data)
+                    url_index[url] = url_data
+                else:
+                    # 这是一个已存在但没有关键词数据的URL，也保留基本信息
+                    stored_item = stored_items.get(url)
+                    encrypted_url = stored_item['encrypted_url'] if stored_item is not None else cipher.encrypt_url(url)
+                    url_data = {
+                        'encrypted_url': encrypted_url,
+                        'lastmod': lastmod
+                    }
+                    new_encrypted_data.append(url_data)
+                    url_index[url] = url_data
+
+        return (updated_urls, url_keywords_map, keywords_set, new_encrypted_data, url_index,
+                previous_records, (new_url_count, updated_url_count))
+
+    @staticmethod
+    def _extract_keywords(urls: List[str]) -> List[str]:
+        """批量从URL提取并规范化关键词，无效的URL对应空字符串"""
+        # 使用统一的关键词规范化函数
+        normalize = keyword_extractor.normalize_keyword
+        return [normalize(keyword_raw) if keyword_raw else ""
+                for keyword_raw in keyword_extractor.extract_keywords_batch(urls)]
+
+
+# 进程池模式下每个子进程复用的收集器实例
+_process_collector: Optional[SiteDataCollector] = None
+
+
+def collect_site_data(site_url: str, site_index: int) -> Tuple[str, Dict]:
+    """进程池入口函数，在子进程中收集单个网站数据
+
+    子进程通过spawn启动，会继承父进程的环境变量（含ENCRYPTION_KEY），
+    并在导入时按相同配置初始化加密器、数据管理器和网站地图解析器。
+
+    Args:
+        site_url: 网站URL
+        site_index: 网站索引
+
+    Returns:
+        站点ID和包含更新URL、关键词等信息的字典
+    """
+    global _process_collector
+    if _process_collector is None:
+        _process_collector = SiteDataCollector()
+    return _process_collector.collect_site_data(site_url, site_index)
@@ -5,12 +5,15 @@
 专门负责处理站点更新的单一职责
 """
 
-import base64
-import json
 import logging
-from typing import Dict, List, Any
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Any, Optional, Tuple
 from urllib.parse import urlparse
 
+import requests
+
 from src.config import config
 from src.data_manager import data_manager
 from src.encryption import encryptor
@@ -56,7 +59,7 @@ class SiteUpdateProcessor:
 
         # 只保存查询成功的URL数据
         successful_urls = list(keywords_data_to_store.keys())
-        failed_urls = [url for url in updated_urls if url not in successful_urls]
+        failed_urls = [url for url in updated_urls if url not in keywords_data_to_store]
 
         if failed_urls:
             logger.warning(f"网站 {site_id} 有 {len(failed_urls)} 个URL的关键词查询失败，将在下次运行时重试")
@@ -64,9 +67,12 @@ class SiteUpdateProcessor:
         if successful_urls:
             logger.info(f"网站 {site_id} 有 {len(successful_urls)} 个URL查询成功，将保存完整数据")
             # 更新加密数据，添加关键词数据
-            self._update_encrypted_data_with_keywords(new_encrypted_data, keywords_data_to_store, successful_urls)
-            # 保存成功查询的URL数据
-            data_manager.update_site_data(site_id, new_encrypted_data)
+            self._update_encrypted_data_with_keywords(
+                new_encrypted_data, keywords_data_to_store, successful_urls,
+                site_data.get('url_index'), site_data.get('previous_records')
+            )
+            # 暂存成功查询的URL数据，运行结束时统一保存
+            data_manager.mark_dirty(site_id, new_encrypted_data)
         else:
             logger.warning(f"网站 {site_id} 没有成功查询的URL，不保存数据")
 
@@ -122,68 +128,86 @@ class SiteUpdateProcessor:
 
     def _update_encrypted_data_with_keywords(self, new_encrypted_data: List[Dict],
                                            keywords_data_to_store: Dict[str, Dict],
-                                           successful_urls: List[str]) -> None:
+                                           successful_urls: List[str],
+                                           url_index: Optional[Dict[str, Dict]] = None,
+                                           previous_records: Optional[Dict[str, Tuple[Dict, Any]]] = None) -> None:
         """更新加密数据，为成功查询的URL添加关键词数据
 
         增强版：如果成功的URL没有对应的加密数据，则创建新的加密数据项
-        """
-        import base64
-        import json
-        from src.encryption import encryptor
 
-        # 创建URL到加密数据的映射
-        url_to_encrypted_data = {}
-        for item in new_encrypted_data:
-            if 'encrypted_url' in item:
-                try:
-                    decrypted_url = encryptor.decrypt_url(item['encrypted_url'])
-                    if decrypted_url:
-                        url_to_encrypted_data[decrypted_url] = item
-                except Exception as e:
-                    logger.error(f"解密URL时出错: {e}")
+        Args:
+            new_encrypted_data: 收集阶段保留的加密数据列表，原地更新
+            keywords_data_to_store: URL到关键词数据的映射
+            successful_urls: 查询成功的URL列表
+            url_index: 收集阶段建立的明文URL到数据项的索引，提供时无需逐条解密
+            previous_records: 更新URL到(上次存储的数据项, 上次的关键词数据)的映射，
+                关键词未变化时复用已有密文，避免重新加密
+        """
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        previous_records = previous_records or {}
+
+        # 同一站点的记录复用一个加密会话，避免逐条创建密码对象
+        with encryptor.session() as cipher:
+            if url_index is not None:
+                # 收集阶段已记录每个数据项对应的明文URL，直接复用
+                url_to_encrypted_data = dict(url_index)
+                decrypted_items = list(url_to_encrypted_data.items())
+            else:
+                url_to_encrypted_data, decrypted_items = self._index_encrypted_data(cipher, new_encrypted_data)
 
-        # 为成功查询的URL添加关键词数据
-        for url in successful_urls:
-            if url in keywords_data_to_store:
-                try:
-                    # 如果URL没有对应的加密数据，创建新的
-                    if url not in url_to_encrypted_data:
+            # 为成功查询的URL添加关键词数据：先确定需要加密的内容，再批量加密
+            pending_urls = []  # [(新数据项, 明文URL)]
+            pending_keywords = []  # [(数据项, 关键词数据)]
+            for url in successful_urls:
+                if url not in keywords_data_to_store:
+                    continue
+                previous = previous_records.get(url)
+                # 如果URL没有对应的加密数据，创建新的（已存储过的URL直接复用原URL密文）
+                item = url_to_encrypted_data.get(url)
+                if item is None:
+                    if debug_enabled:
                         logger.debug(f"为成功URL创建新的加密数据: {PrivacyMasker.extract_domain_safely(url)}")
-                        encrypted_url = encryptor.encrypt_url(url)
-                        new_item = {
-                            'encrypted_url': encrypted_url,
-                            'lastmod': None  # 新URL暂时没有lastmod信息
-                        }
-                        url_to_encrypted_data[url] = new_item
-                        new_encrypted_data.append(new_item)
-
-                    # 加密关键词数据并添加到对应项
-                    keywords_json = json.dumps(keywords_data_to_store[url])
-                    encrypted_keywords = encryptor.encrypt_data(keywords_json.encode('utf-8'))
-                    url_to_encrypted_data[url]['keywords_data'] = base64.b64encode(encrypted_keywords).decode('utf-8')
-
-                except Exception as e:
-                    logger.error(f"处理URL加密数据时出错: {e}")
-                    # 不输出完整URL，避免敏感信息泄露
-                    domain_part = PrivacyMasker.extract_domain_safely(url)
-                    logger.error(f"出错的域名: {domain_part}")
-
-        # 从new_encrypted_data中移除失败的URL，只保留成功的
+                    item = {
+                        'encrypted_url': previous[0]['encrypted_url'] if previous else None,
+                        'lastmod': None  # 新URL暂时没有lastmod信息
+                    }
+                    if not previous:
+                        pending_urls.append((item, url))
+                    url_to_encrypted_data[url] = item
+                    decrypted_items.append((url, item))
+
+                # 关键词数据与上次存储的完全相同时复用原密文，否则等待批量加密
+                keywords_data = keywords_data_to_store[url]
+                if previous and 'keywords_data' in previous[0] and previous[1] == keywords_data:
+                    item['keywords_data'] = previous[0]['keywords_data']
+                else:
+                    pending_keywords.append((item, keywords_data))
+
+            try:
+                encrypted_urls = cipher.encrypt_many([url.encode('utf-8') for _, url in pending_urls])
+                for (item, _), encrypted_url in zip(pending_urls, encrypted_urls):
+                    item['encrypted_url'] = encrypted_url
+
+                encrypted_keywords = cipher.encrypt_json_many([data for _, data in pending_keywords])
+                for (item, _), encrypted in zip(pending_keywords, encrypted_keywords):
+                    item['keywords_data'] = encrypted
+            except (TypeError, ValueError) as e:
+                logger.error(f"批量加密URL数据时出错: {e}")
+                # 加密失败的新数据项不保存，避免写入不完整的记录
+                failed_ids = {id(item) for item, _ in pending_urls if item['encrypted_url'] is None}
+                failed_ids.update(id(item) for item, _ in pending_keywords if 'keywords_data' not in item)
+                decrypted_items = [(u, item) for u, item in decrypted_items if id(item) not in failed_ids]
+
+        # 从new_encrypted_data中移除失败的URL，只保留成功的（集合查找，避免O(N·M)扫描）
+        successful_url_set = set(successful_urls)
         successful_encrypted_data = []
-        for item in new_encrypted_data:
-            if 'encrypted_url' in item:
-                try:
-                    decrypted_url = encryptor.decrypt_url(item['encrypted_url'])
-                    if decrypted_url and decrypted_url in successful_urls:
-                        successful_encrypted_data.append(item)
-                    elif decrypted_url:
-                        # 这是一个失败的URL，不保存
-                        logger.debug(f"跳过保存失败查询的URL: {PrivacyMasker.extract_domain_safely(decrypted_url)}")
-                except Exception as e:
-                    logger.error(f"处理加密URL时出错: {e}")
-            else:
-                # 保留没有encrypted_url的项目（如果有的话）
+        for decrypted_url, item in decrypted_items:
+            if decrypted_url is None or decrypted_url in successful_url_set:
+                # 保留成功的URL以及没有encrypted_url的项目（如果有的话）
                 successful_encrypted_data.append(item)
+            elif debug_enabled:
+                # 这是一个失败的URL，不保存
+                logger.debug(f"跳过保存失败查询的URL: {PrivacyMasker.extract_domain_safely(decrypted_url)}")
 
         # 更新原始列表
         new_encrypted_data.clear()
@@ -191,6 +215,28 @@ class SiteUpdateProcessor:
 
         logger.info(f"成功处理 {len(successful_encrypted_data)} 个URL的加密数据")
 
+    @staticmethod
+    def _index_encrypted_data(cipher, new_encrypted_data: List[Dict]) -> Tuple[Dict[str, Dict], List[Tuple[Optional[str], Dict]]]:
+        """解密数据项中的URL，建立URL到数据项的映射，每项只解密一次
+
+        Returns:
+            (URL到数据项的映射, [(解密后的URL或None, 数据项)])
+        """
+        url_to_encrypted_data = {}
+        decrypted_items = []
+        for item in new_encrypted_data:
+            if 'encrypted_url' in item:
+                try:
+                    decrypted_url = cipher.decrypt_url(item['encrypted_url'])
+                    if decrypted_url:
+                        url_to_encrypted_data[decrypted_url] = item
+                        decrypted_items.append((decrypted_url, item))
+                except (TypeError, ValueError) as e:
+                    logger.error(f"解密URL时出错: {e}")
+            else:
+                decrypted_items.append((None, item))
+        return url_to_encrypted_data, decrypted_items
+
     def _save_existing_verified_data(self, site_id: str, new_encrypted_data: List[Dict]) -> None:
         """安全地保存现有的已验证数据，不添加新的未验证数据
 
@@ -198,25 +244,15 @@ class SiteUpdateProcessor:
             site_id: 站点ID
             new_encrypted_data: 包含现有数据的加密数据列表
         """
-        # 只保存已经包含keywords_data的URL（这些是之前验证成功的）
-        verified_data = []
-        for item in new_encrypted_data:
-            if 'keywords_data' in item:
-                # 这是之前验证成功的数据，可以保留
-                verified_data.append(item)
-            else:
-                # 这是新的未验证数据，不保存
-                try:
-                    if 'encrypted_url' in item:
-                        decrypted_url = encryptor.decrypt_url(item['encrypted_url'])
-                        if decrypted_url:
-                            domain = PrivacyMasker.extract_domain_safely(decrypted_url)
-                            logger.debug(f"跳过保存未验证的URL: {domain}")
-                except Exception as e:
-                    logger.error(f"处理加密URL时出错: {e}")
-
-        # 只保存已验证的数据
-        data_manager.update_site_data(site_id, verified_data)
+        # 只保存已经包含keywords_data的URL（这些是之前验证成功的），
+        # 未验证的数据直接丢弃，只为日志而解密URL没有必要
+        verified_data = [item for item in new_encrypted_data if 'keywords_data' in item]
+        skipped_count = len(new_encrypted_data) - len(verified_data)
+        if skipped_count:
+            logger.debug(f"网站 {site_id} 跳过保存 {skipped_count} 个未验证的URL")
+
+        # 只保存已验证的数据，运行结束时统一写入文件
+        data_manager.mark_dirty(site_id, verified_data)
         logger.info(f"网站 {site_id} 保存了 {len(verified_data)} 个已验证的URL")
 
 
@@ -248,9 +284,10 @@ class SiteUpdateProcessor:
             input_keyword = keyword.strip().lower()
             if api_keyword and not self._keywords_match(api_keyword, input_keyword):
                 # 关键词不匹配，记录调试信息
-                masked_api_kw = PrivacyMasker.mask_keyword(api_keyword)
-                masked_input_kw = PrivacyMasker.mask_keyword(input_keyword)
-                logger.debug(f"关键词不匹配: API返回={masked_api_kw}, 期望={masked_input_kw}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    masked_api_kw = PrivacyMasker.mask_keyword(api_keyword)
+                    masked_input_kw = PrivacyMasker.mask_keyword(input_keyword)
+                    logger.debug(f"关键词不匹配: API返回={masked_api_kw}, 期望={masked_input_kw}")
                 return False
 
         # 检查metrics字段
@@ -338,6 +375,7 @@ class SiteUpdateProcessor:
         try:
             # 准备批量提交数据
             batch_updates = []
+            debug_enabled = logger.isEnabledFor(logging.DEBUG)
 
             for url in updated_urls:
                 # 获取URL的关键词
@@ -351,12 +389,13 @@ class SiteUpdateProcessor:
                 
                 try:
                     # 记录关键词数据的结构（调试级别）
-                    logger.debug(f"关键词数量: {len(keywords_list)}")
-                    logger.debug(f"关键词数据类型: {type(api_data)}, 是否为空: {not bool(api_data)}")
-                    if api_data:
-                        logger.debug(f"关键词数据包含的键: {list(api_data.keys())}")
-                    if api_data and 'data' in api_data:
-                        logger.debug(f"关键词数据包含 {len(api_data['data'])} 个项目")
+                    if debug_enabled:
+                        logger.debug(f"关键词数量: {len(keywords_list)}")
+                        logger.debug(f"关键词数据类型: {type(api_data)}, 是否为空: {not bool(api_data)}")
+                        if api_data:
+                            logger.debug(f"关键词数据包含的键: {list(api_data.keys())}")
+                        if api_data and 'data' in api_data:
+                            logger.debug(f"关键词数据包含 {len(api_data['data'])} 个项目")
 
                     # 准备单条更新数据
                     update_data = metrics_api.prepare_update_data(url, keywords_list, api_data)
@@ -366,8 +405,8 @@ class SiteUpdateProcessor:
                     domain_part = PrivacyMasker.extract_domain_safely(url)
                     masked_keyword = PrivacyMasker.mask_keyword(keyword)
                     logger.warning(f"跳过无效数据: 域名={domain_part}, 关键词={masked_keyword}, 原因={e}")
-                except Exception as e:
-                    # 其他错误
+                except (KeyError, IndexError, TypeError, AttributeError) as e:
+                    # 其他数据结构错误
                     domain_part = PrivacyMasker.extract_domain_safely(url)
                     logger.error(f"准备URL数据时出错: 域名={domain_part}, 错误={e}")
 
@@ -377,67 +416,61 @@ class SiteUpdateProcessor:
                 
         except Exception as e:
             logger.error(f"发送数据到API时出错: {e}")
-            import traceback
-            logger.error(f"错误详情: {traceback.format_exc()}")
+            logger.debug("发送数据到API出错详情", exc_info=True)
 
     def _batch_submit_updates(self, batch_updates: List[Dict]) -> None:
-        """批量提交更新数据 - 性能优化版本"""
-        from collections import deque
-        import time
-
-        # 创建队列
-        update_queue = deque(batch_updates)
+        """批量提交更新数据 - 各批次相互独立，并发提交"""
         max_batch_size = metrics_api.max_batch_size
         total_updates = len(batch_updates)
-        processed_updates = 0
         failed_updates = []  # 存储失败的更新
         retry_updates = []  # 存储需要重试的更新
 
-        logger.info(f"开始批量提交处理，共 {total_updates} 条数据，每批 {max_batch_size} 条")
-
-        # 处理队列中的数据
-        while update_queue:
-            # 从队列中获取一批数据
-            current_batch = []
-            batch_size = min(max_batch_size, len(update_queue))
-
-            for _ in range(batch_size):
-                if update_queue:  # 再次检查队列是否为空
-                    current_batch.append(update_queue.popleft())
+        # 预先切分批次
+        batches = [batch_updates[i:i + max_batch_size] for i in range(0, total_updates, max_batch_size)]
+        max_workers = max(1, min(len(batches), config.metrics_api_max_concurrent))
 
-            # 更新进度
-            processed_updates += len(current_batch)
-            progress = (processed_updates / total_updates) * 100
+        logger.info(f"开始批量提交处理，共 {total_updates} 条数据，每批 {max_batch_size} 条，"
+                    f"共 {len(batches)} 批，并发 {max_workers}")
 
-            # 只在最后一批输出进度日志
-            if processed_updates == total_updates:
-                logger.info(f"批量提交进度: {processed_updates}/{total_updates} ({progress:.1f}%)")
-
-            # 批量提交
-            batch_sent = metrics_api.send_batch_updates(current_batch)
-
-            if batch_sent:
-                # 只在最后一批输出成功日志
+        processed_updates = 0
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='metrics-submit') as executor:
+            future_to_batch = {
+                executor.submit(metrics_api.send_batch_updates, batch): batch
+                for batch in batches
+            }
+
+            for future in as_completed(future_to_batch):
+                current_batch = future_to_batch[future]
+                try:
+                    batch_sent = future.result()
+                except (requests.RequestException, OSError, ValueError) as e:
+                    logger.error(f"批量提交异常: {e}")
+                    batch_sent = False
+
+                processed_updates += len(current_batch)
+
+                if not batch_sent:
+                    logger.warning(f"批量提交 {len(current_batch)} 条数据失败，将加入重试队列")
+                    # 将失败的批次加入重试队列
+                    retry_updates.extend(current_batch)
+
+                    # 记录详细的批量提交失败信息，帮助调试（仅DEBUG级别时执行逐条格式化）
+                    if logger.isEnabledFor(logging.DEBUG):
+                        for i, update_data in enumerate(current_batch):
+                            url = update_data.get("url", "")
+                            keywords = [update_data.get("keyword", "")]
+                            keyword_trends = update_data.get("metrics", {})
+                            # 不输出完整URL，避免敏感信息泄露
+                            domain_part = PrivacyMasker.extract_domain_safely(url)
+                            logger.debug(f"批量提交失败的数据 {i+1}/{len(current_batch)}: "
+                                       f"域名={domain_part}, 关键词={keywords}, 趋势数据项数={len(keyword_trends)}")
+
+                # 只在最后完成的批次输出进度日志
                 if processed_updates == total_updates:
-                    logger.info(f"成功批量提交全部 {total_updates} 条数据")
-            else:
-                logger.warning(f"批量提交 {len(current_batch)} 条数据失败，将加入重试队列")
-                # 将失败的批次加入重试队列
-                retry_updates.extend(current_batch)
-
-                # 记录详细的批量提交失败信息，帮助调试
-                for i, update_data in enumerate(current_batch):
-                    url = update_data.get("url", "")
-                    keywords = [update_data.get("keyword", "")]
-                    keyword_trends = update_data.get("metrics", {})
-                    # 不输出完整URL，避免敏感信息泄露
-                    domain_part = PrivacyMasker.extract_domain_safely(url)
-                    logger.debug(f"批量提交失败的数据 {i+1}/{len(current_batch)}: "
-                               f"域名={domain_part}, 关键词={keywords}, 趋势数据项数={len(keyword_trends)}")
-
-            # 批次间添加小延迟，避免请求过快
-            if update_queue:  # 如果还有数据要处理
-                time.sleep(0.5)  # 减少到0.5秒，提升处理速度
+                    progress = (processed_updates / total_updates) * 100
+                    logger.info(f"批量提交进度: {processed_updates}/{total_updates} ({progress:.1f}%)")
+                    if not retry_updates:
+                        logger.info(f"成功批量提交全部 {total_updates} 条数据")
 
         # 处理重试队列
         if retry_updates:
@@ -456,9 +489,6 @@ class SiteUpdateProcessor:
 
     def _retry_failed_updates(self, retry_updates: List[Dict], failed_updates: List[Dict]) -> None:
         """重试失败的更新 - 性能优化：单次重试机制"""
-        import time
-        from collections import deque
-
         if not retry_updates:
             return
 
@@ -482,7 +512,7 @@ class SiteUpdateProcessor:
             if not current_retry_batch:
                 break
 
-            # 重试提交
+            # 重试提交（提交间隔由metrics_api的令牌桶控制）
             retry_sent = metrics_api.send_batch_updates(current_retry_batch)
 
             if retry_sent:
@@ -493,10 +523,6 @@ class SiteUpdateProcessor:
                 failed_updates.extend(current_retry_batch)
                 logger.debug(f"重试失败: {len(current_retry_batch)} 条数据")
 
-            # 重试间隔
-            if retry_queue:
-                time.sleep(1)
-
         if retry_success_count > 0:
             logger.info(f"重试成功: {retry_success_count}/{len(retry_updates)} 条数据")
 
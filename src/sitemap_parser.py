@@ -12,6 +12,7 @@ import io
 import time
 import re
 import zlib  # 修复：在模块级别导入zlib，避免作用域问题
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional, List
 import xml.etree.ElementTree as ET
 from urllib.parse import urlparse
@@ -39,6 +40,19 @@ class SitemapParser:
 
         # 性能优化配置
         from src.config import config
+
+        # 多个网站并发收集时共享该会话，连接池大小与收集线程数保持一致，避免连接被丢弃后重建
+        pool_size = max(1, config.max_collector_workers, config.max_concurrent)
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # 子sitemap并发下载的线程数，复用上面的连接池
+        self.max_sub_sitemap_workers = max(1, config.max_concurrent)
+
         self.performance_mode = hasattr(config, 'enable_performance_mode') and config.enable_performance_mode
         if self.performance_mode:
             # 性能模式下减少超时时间和重试次数
@@ -777,18 +791,18 @@ class SitemapParser:
             if sitemap_urls:
                 logger.info(f"发现sitemap index，包含 {len(sitemap_urls)} 个子sitemap")
                 
-                # 合并所有子sitemap的结果
+                # 子sitemap之间互不依赖，并发下载后按原顺序合并结果，
+                # 耗时由各子sitemap之和降为其中最慢的一个
+                sub_urls = sitemap_urls[:5]  # 限制最多处理5个子sitemap
                 combined_data = {}
-                for sub_url in sitemap_urls[:5]:  # 限制最多处理5个子sitemap
-                    domain_part = urlparse(sub_url).netloc if sub_url else '***'
-                    logger.info(f"解析子sitemap: {domain_part}")
-                    try:
-                        sub_data = self.download_and_parse_sitemap(sub_url, "sub")
-                        combined_data.update(sub_data)
-                        time.sleep(0.5)  # 避免请求过快
-                    except Exception as e:
-                        logger.warning(f"解析子sitemap失败: {domain_part}, 错误: {e}")
-                        continue
+                max_workers = max(1, min(len(sub_urls), self.max_sub_sitemap_workers))
+                with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sub-sitemap') as executor:
+                    futures = [
+                        executor.submit(self._fetch_sub_sitemap, sub_url)
+                        for sub_url in sub_urls
+                    ]
+                    for future in futures:
+                        combined_data.update(future.result())
                 
                 logger.info(f"sitemap index解析完成，总共获得 {len(combined_data)} 个URL")
                 return combined_data
@@ -799,6 +813,23 @@ class SitemapParser:
             logger.error(f"解析sitemap index失败: {e}")
             return {}
 
+    def _fetch_sub_sitemap(self, sub_url: str) -> Dict[str, Optional[str]]:
+        """下载并解析单个子sitemap，失败时返回空结果
+
+        Args:
+            sub_url: 子sitemap的URL
+
+        Returns:
+            Dict[str, Optional[str]]: URL到lastmod的映射
+        """
+        domain_part = urlparse(sub_url).netloc if sub_url else '***'
+        logger.info(f"解析子sitemap: {domain_part}")
+        try:
+            return self.download_and_parse_sitemap(sub_url, "sub")
+        except Exception as e:
+            logger.warning(f"解析子sitemap失败: {domain_part}, 错误: {e}")
+            return {}
+
     def _extract_text_sitemap_urls(self, root: ET.Element, original_url: str) -> List[str]:
         """从纯文本内容中提取sitemap URL列表（如game-game.com格式）"""
         try:
@@ -930,11 +961,25 @@ class SitemapParser:
         return False
 
     @staticmethod
-    def is_updated_today(lastmod: Optional[str]) -> bool:
-        """检查lastmod日期是否是今天"""
+    def is_updated_today(lastmod: Optional[str], today: Optional[str] = None) -> bool:
+        """检查lastmod日期是否是今天
+
+        Args:
+            lastmod: sitemap中的lastmod值
+            today: 预先计算的今天日期（YYYY-MM-DD），批量判断时由调用方传入避免重复计算
+
+        Returns:
+            bool: 是否为今天
+        """
         if not lastmod:
             return False
 
+        # 快速路径：标准ISO-8601日期（YYYY-MM-DD或YYYY-MM-DDT...）直接比较日期前缀
+        if len(lastmod) >= 10 and lastmod[4] == '-' and lastmod[7] == '-' and \
+                (len(lastmod) == 10 or lastmod[10] == 'T'):
+            return lastmod[:10] == (today or datetime.date.today().isoformat())
+
+        # 慢速路径：非标准格式交给strptime解析
         try:
             date_str = lastmod.split('T')[0]  # 提取日期部分
             lastmod_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
@@ -9,7 +9,8 @@ import threading
 import queue
 import time
 import logging
-from typing import Dict, Any, Optional, Protocol, TypeVar, Generic
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Protocol, TypeVar, Generic, Tuple
 from contextlib import contextmanager
 from abc import ABC, abstractmethod
 
@@ -273,6 +274,98 @@ class ThreadSafeCache(Generic[T]):
         with self._lock:
             return len(self._cache)
 
+class TTLCache(Generic[T]):
+    """带过期时间的线程安全LRU缓存 - 单一职责：按键缓存短期有效的数据"""
+    
+    def __init__(self, max_size: int = 1000, ttl: float = 3600):
+        self._cache: "OrderedDict[str, Tuple[float, T]]" = OrderedDict()
+        self._max_size = max_size
+        self._ttl = ttl
+        self._lock = threading.Lock()
+    
+    def get_many(self, keys) -> Dict[str, T]:
+        """批量获取未过期的缓存值，未命中的键不出现在结果中"""
+        now = time.monotonic()
+        hits: Dict[str, T] = {}
+        with self._lock:
+            for key in keys:
+                entry = self._cache.get(key)
+                if entry is None:
+                    continue
+                expires_at, value = entry
+                if expires_at <= now:
+                    del self._cache[key]
+                    continue
+                self._cache.move_to_end(key)
+                hits[key] = value
+        return hits
+    
+    def put_many(self, items: Dict[str, T]) -> None:
+        """批量写入缓存值，超出容量时淘汰最久未使用的项"""
+        expires_at = time.monotonic() + self._ttl
+        with self._lock:
+            for key, value in items.items():
+                self._cache[key] = (expires_at, value)
+                self._cache.move_to_end(key)
+            while len(self._cache) > self._max_size:
+                self._cache.popitem(last=False)
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._cache.clear()
+    
+    def size(self) -> int:
+        """获取缓存大小"""
+        with self._lock:
+            return len(self._cache)
+
+class TokenBucket:
+    """令牌桶限流器 - 单一职责：按固定速率发放请求许可，允许一定突发"""
+    
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """
+        Args:
+            rate: 每秒补充的令牌数，<=0 表示不限流
+            capacity: 桶容量，即允许的最大突发请求数
+        """
+        self._rate = rate
+        self._capacity = max(1.0, capacity)
+        self._tokens = self._capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float) -> None:
+        """按流逝时间补充令牌（调用方持有锁）"""
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+    
+    def consume(self, tokens: float = 1.0) -> float:
+        """获取令牌，不足时只阻塞到令牌补足为止
+        
+        令牌可以被预支为负数，后续调用者按排队顺序等待更长时间，锁不会在睡眠期间被持有。
+        
+        Returns:
+            float: 实际等待的秒数
+        """
+        if self._rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            wait_time = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+    
+    def pause(self, seconds: float) -> None:
+        """服务端要求退避（如429 Retry-After）时，让所有后续请求至少等待指定秒数"""
+        if self._rate <= 0 or seconds <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -seconds * self._rate)
+
 # Dependency Inversion Principle - 依赖抽象而非具体实现
 class ConcurrencyManager:
     """并发管理器 - 协调各种并发组件"""
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ContentWatcher数据保存失败处理测试
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# 导入src模块前设置项目路径和加密密钥
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('ENCRYPTION_KEY', '0' * 32)
+
+from src import data_manager as data_manager_module  # noqa: E402
+from src.content_watcher import ContentWatcher  # noqa: E402
+from src.data_manager import data_manager  # noqa: E402
+
+
+class FlushFailureTest(unittest.TestCase):
+    """流式写入和备用写入都失败时，flush返回False且run()抛出异常"""
+
+    def setUp(self):
+        # 数据文件指向不存在的目录，使两种写入方式都失败；跳过重试间隔
+        missing_dir = os.path.join(tempfile.mkdtemp(), 'missing')
+        patches = [
+            mock.patch.object(data_manager_module, 'DATA_FILE', os.path.join(missing_dir, 'previous_data.json')),
+            mock.patch.object(data_manager_module.time, 'sleep'),
+            mock.patch.object(data_manager, 'previous_data', dict(data_manager.previous_data)),
+            mock.patch.object(data_manager, '_dirty', False),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_flush_reports_failure(self):
+        data_manager.mark_dirty('site', [])
+        self.assertFalse(data_manager.flush())
+
+    def test_run_raises_when_flush_fails(self):
+        watcher = ContentWatcher(test_mode=True)
+        with mock.patch.object(watcher, '_run_stages', side_effect=lambda: data_manager.mark_dirty('site', [])):
+            with self.assertRaises(Exception):
+                watcher.run()
+
+    def test_stage_error_not_replaced(self):
+        watcher = ContentWatcher(test_mode=True)
+
+        def failing_stages():
+            data_manager.mark_dirty('site', [])
+            raise ValueError('stage failed')
+
+        with mock.patch.object(watcher, '_run_stages', side_effect=failing_stages):
+            with self.assertRaises(ValueError):
+                watcher.run()
+
+
+if __name__ == '__main__':
+    unittest.main()
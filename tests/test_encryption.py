@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+加密模块测试：EncryptionSession与Encryptor的输出格式必须可以互相解密
+"""
+
+import os
+import sys
+import unittest
+from pathlib import Path
+
+# 导入src模块前设置项目路径和加密密钥
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('ENCRYPTION_KEY', '0' * 32)
+
+from src.encryption import Encryptor, _CipherCodec, _b64decode, _b64encode, encryptor  # noqa: E402
+
+SAMPLE_TEXTS = [
+    '',
+    'https://example.com/game/some-cool-game',
+    '关键词数据 – ünïcödé 🎮',
+    'x' * 15,
+    'y' * 16,
+    'z' * 17,
+]
+
+SAMPLE_OBJECTS = [
+    {},
+    [],
+    {'status': 'success', 'data': [{'keyword': '中文', 'metrics': {'avg_monthly_searches': 10}}]},
+]
+
+
+class CipherCodecTest(unittest.TestCase):
+    """_CipherCodec是抽象基类，不能直接实例化"""
+
+    def test_codec_is_abstract(self):
+        with self.assertRaises(TypeError):
+            _CipherCodec()
+
+
+class SessionInteropTest(unittest.TestCase):
+    """会话加密与逐条加密的结果互相兼容，包括空字符串和非ASCII字符串"""
+
+    def test_session_encrypt_then_encryptor_decrypt(self):
+        with encryptor.session() as cipher:
+            for text in SAMPLE_TEXTS:
+                with self.subTest(text=text):
+                    self.assertEqual(encryptor.decrypt_url(cipher.encrypt_url(text)), text)
+                    self.assertEqual(encryptor.decrypt_data(cipher.encrypt_data(text.encode('utf-8'))), text)
+            for obj in SAMPLE_OBJECTS:
+                with self.subTest(obj=obj):
+                    self.assertEqual(encryptor.decrypt_json(cipher.encrypt_json(obj)), obj)
+
+    def test_encryptor_encrypt_then_session_decrypt(self):
+        with encryptor.session() as cipher:
+            for text in SAMPLE_TEXTS:
+                with self.subTest(text=text):
+                    self.assertEqual(cipher.decrypt_url(encryptor.encrypt_url(text)), text)
+                    self.assertEqual(cipher.decrypt_data(encryptor.encrypt_data(text.encode('utf-8'))), text)
+            for obj in SAMPLE_OBJECTS:
+                with self.subTest(obj=obj):
+                    self.assertEqual(cipher.decrypt_json(encryptor.encrypt_json(obj)), obj)
+
+    def test_encrypt_many_matches_encryptor(self):
+        datas = [text.encode('utf-8') for text in SAMPLE_TEXTS]
+        with encryptor.session() as cipher:
+            encrypted = cipher.encrypt_many(datas)
+            encrypted_json = cipher.encrypt_json_many(SAMPLE_OBJECTS)
+        self.assertEqual(len(encrypted), len(datas))
+        self.assertEqual(len(set(encrypted)), len(encrypted))
+        for value, text in zip(encrypted, SAMPLE_TEXTS):
+            self.assertEqual(encryptor.decrypt_url(value), text)
+        for value, obj in zip(encrypted_json, SAMPLE_OBJECTS):
+            self.assertEqual(encryptor.decrypt_json(value), obj)
+
+    def test_decrypt_many_matches_encryptor(self):
+        values = [encryptor.encrypt_url(text) for text in SAMPLE_TEXTS]
+        with encryptor.session() as cipher:
+            decrypted = cipher.decrypt_many(values)
+        self.assertEqual([data.decode('utf-8') for data in decrypted], SAMPLE_TEXTS)
+
+    def test_decrypt_many_marks_invalid_records(self):
+        valid = encryptor.encrypt_url('https://example.com/a')
+        short = _b64encode(_b64decode(valid)[:16])
+        values = ['', 'not base64 !!', short, valid, valid[:-4] + 'AAAA', encryptor.encrypt_url('')]
+        with encryptor.session() as cipher:
+            decrypted = cipher.decrypt_many(values)
+        self.assertEqual(decrypted[:3], [None, None, None])
+        self.assertEqual(decrypted[3], b'https://example.com/a')
+        self.assertEqual(decrypted[5], b'')
+
+    def test_sessions_with_separate_encryptors(self):
+        other = Encryptor()
+        with other.session() as cipher:
+            values = cipher.encrypt_many([b'a', b'b'])
+        with encryptor.session() as cipher:
+            self.assertEqual(cipher.decrypt_many(values), [b'a', b'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
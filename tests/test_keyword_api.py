@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+KeywordAPI批次调度测试
+"""
+
+import os
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# 导入src模块前设置项目路径和加密密钥
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('ENCRYPTION_KEY', '0' * 32)
+
+from src.config import config  # noqa: E402
+from src.keyword_api import KeywordAPI  # noqa: E402
+
+
+class IterBatchResultsTest(unittest.TestCase):
+    """_iter_batch_results在批次数多于并发数时应查询全部批次"""
+
+    def _run_batches(self, concurrency: int, batches):
+        api = KeywordAPI(api_url='http://127.0.0.1/?q=')
+        self.addCleanup(api.session.close)
+        with mock.patch.object(config, 'keywords_concurrency', concurrency), \
+                mock.patch.object(api, 'get_keyword_data',
+                                  side_effect=lambda keywords, max_retries, count: {'keywords': keywords}):
+            return list(api._iter_batch_results(iter(batches), max_retries=0))
+
+    def test_all_batches_queried(self):
+        batches = [['a'], ['b'], ['c'], ['d', 'e']]
+        for concurrency in (0, 1, 2):
+            with self.subTest(concurrency=concurrency):
+                results = self._run_batches(concurrency, batches)
+                self.assertCountEqual([batch for batch, _ in results], batches)
+                for batch, result in results:
+                    self.assertEqual(result, {'keywords': ",".join(batch)})
+
+
+if __name__ == '__main__':
+    unittest.main()